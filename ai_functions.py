@@ -1,37 +1,115 @@
+import os
+
 from openai import OpenAI
+from jiter import from_json
 import streamlit as st
 
+from llm_cache import cache_key, get_cached_response, put_cached_response
+from llm_resilience import guarded_call, guarded_stream
+from llm_metrics import track_llm_call, report_usage
+
 @st.cache_resource
 def get_client():
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    # Retries are handled by llm_resilience, with the shared rate limiter in the loop
+    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"], max_retries=0)
     return client
 
-def chat_prompt_json(prompt_text, system_prompt, max_tokens, json_type):
-    prompt = {
-        "model": "gpt-4o",
-        "messages": [
-            {
-            "role": "system",
-                "content": system_prompt,
-            },
-            {
-                "role": "user",
-                "content": prompt_text[0],
-            },
-        ],
-        "max_tokens": max_tokens
-    }
+# LLM Backends
+#
+# Every request goes through the selected backend, so the game can run against
+# OpenAI or, for offline benchmarks and load tests, against the local stub in
+# llm_stub.py. Choose with configure_llm_backend() or the LLM_BACKEND
+# environment variable ("openai" or "stub"). Calls are rate limited, retried
+# and circuit broken by llm_resilience; when the LLM can't be used they raise
+# LLMUnavailable. Each call is recorded by llm_metrics under the caller name
+# given by the generator that made it.
+
+class LLMBackend:
+    """Interface for answering chat requests built by chat_request()."""
+    name = None
+
+    def complete(self, request):
+        """Return the response text."""
+        raise NotImplementedError
+
+    def complete_json(self, request, json_type):
+        """Return the response parsed as a json_type instance."""
+        raise NotImplementedError
+
+    def stream(self, request, json_type=None):
+        """Yield the response text (JSON text if json_type is given) in pieces."""
+        raise NotImplementedError
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def complete(self, request):
+        completion = get_client().chat.completions.create(**request)
+        _report_usage(completion.usage)
+        return completion.choices[0].message.content
 
-    client = get_client()
+    def complete_json(self, request, json_type):
+        completion = get_client().beta.chat.completions.parse(**request, response_format=json_type)
+        _report_usage(completion.usage)
+        return completion.choices[0].message.parsed
 
-    # Call OpenAI to generate monsters
-    completion = client.beta.chat.completions.parse(**prompt, response_format=json_type)
-    response = completion.choices[0].message.parsed
-    return response
+    def stream(self, request, json_type=None):
+        if json_type is None:
+            # The last chunk carries the usage and no choices
+            for chunk in get_client().chat.completions.create(**request, stream=True, stream_options={"include_usage": True}):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                _report_usage(chunk.usage)
+            return
+        with get_client().beta.chat.completions.stream(**request, response_format=json_type,
+                                                       stream_options={"include_usage": True}) as stream:
+            for event in stream:
+                if event.type == "content.delta":
+                    yield event.delta
+                elif event.type == "chunk":
+                    _report_usage(event.chunk.usage)
 
-def chat_prompt(prompt_text, system_prompt, max_tokens):
-    prompt = {
-        "model": "gpt-4o-mini",
+def _report_usage(usage):
+    if usage is not None:
+        report_usage(usage.prompt_tokens, usage.completion_tokens)
+
+_backend = None
+
+def configure_llm_backend(backend=None, **options):
+    """Select the LLM backend by name ("openai", "stub") or pass an LLMBackend instance.
+
+    Options are passed to the backend's constructor, e.g. latency and jitter
+    for the stub.
+    """
+    global _backend
+    if backend is None or isinstance(backend, str):
+        backend = _make_backend(backend or os.environ.get("LLM_BACKEND", "openai"), **options)
+    _backend = backend
+    return backend
+
+def get_backend():
+    if _backend is None:
+        return configure_llm_backend()
+    return _backend
+
+def _make_backend(name, **options):
+    if name == "openai":
+        return OpenAIBackend(**options)
+    if name == "stub":
+        from llm_stub import StubBackend
+        return StubBackend(**options)
+    raise ValueError(f"Unknown LLM backend: {name!r}")
+
+def _cache_key(request, schema=None):
+    # Responses from other backends must never be served to OpenAI requests
+    backend = get_backend()
+    if backend.name != "openai":
+        request = dict(request, backend=backend.name)
+    return cache_key(request, schema)
+
+def chat_request(model, prompt_text, system_prompt, max_tokens):
+    return {
+        "model": model,
         "messages": [
             {
             "role": "system",
@@ -45,9 +123,92 @@ def chat_prompt(prompt_text, system_prompt, max_tokens):
         "max_tokens": max_tokens
     }
 
-    client = get_client()
+def chat_prompt_json(prompt_text, system_prompt, max_tokens, json_type, cache=True, model="gpt-4o", caller="other"):
+    prompt = chat_request(model, prompt_text, system_prompt, max_tokens)
+
+    with track_llm_call(prompt, caller, cache) as call:
+        # Serve repeated prompts from the persistent response cache
+        key = _cache_key(prompt, json_type.model_json_schema())
+        cached = get_cached_response(key) if cache else None
+        if cached is not None:
+            call.cache_hit()
+            return json_type.model_validate_json(cached)
+
+        response = guarded_call(prompt, lambda: get_backend().complete_json(prompt, json_type))
+        call.completion(response.model_dump_json())
+        if cache:
+            put_cached_response(key, response.model_dump_json())
+        return response
+
+def chat_prompt(prompt_text, system_prompt, max_tokens, cache=True, caller="other"):
+    prompt = chat_request("gpt-4o-mini", prompt_text, system_prompt, max_tokens)
+
+    with track_llm_call(prompt, caller, cache) as call:
+        # Serve repeated prompts from the persistent response cache
+        key = _cache_key(prompt)
+        cached = get_cached_response(key) if cache else None
+        if cached is not None:
+            call.cache_hit()
+            return cached
+
+        response = guarded_call(prompt, lambda: get_backend().complete(prompt))
+        call.completion(response or "")
+        if cache and response is not None:
+            put_cached_response(key, response)
+        return response
+
+# Streaming
+#
+# Same requests and cache as above, but the response is yielded as tokens
+# arrive so the UI can show text after the first token instead of the last.
+
+def chat_prompt_stream(prompt_text, system_prompt, max_tokens, cache=True, caller="other"):
+    """Yield the chat_prompt response in pieces as it is generated."""
+    prompt = chat_request("gpt-4o-mini", prompt_text, system_prompt, max_tokens)
+
+    with track_llm_call(prompt, caller, cache, stream=True) as call:
+        key = _cache_key(prompt)
+        cached = get_cached_response(key) if cache else None
+        if cached is not None:
+            call.cache_hit()
+            yield cached
+            return
+
+        chunks = []
+        for chunk in guarded_stream(prompt, lambda: get_backend().stream(prompt)):
+            call.first_token()
+            chunks.append(chunk)
+            yield chunk
+        call.completion("".join(chunks))
+        if cache and chunks:
+            put_cached_response(key, "".join(chunks))
+
+def chat_prompt_json_stream(prompt_text, system_prompt, max_tokens, json_type, cache=True, caller="other"):
+    """Yield partially parsed chat_prompt_json responses (plain dicts) as they are generated.
+
+    Strings still being written are included, so text fields grow token by
+    token. The validated json_type instance is the generator's return value:
+    use ``details = yield from chat_prompt_json_stream(...)`` to get it.
+    """
+    prompt = chat_request("gpt-4o", prompt_text, system_prompt, max_tokens)
+
+    with track_llm_call(prompt, caller, cache, stream=True) as call:
+        key = _cache_key(prompt, json_type.model_json_schema())
+        cached = get_cached_response(key) if cache else None
+        if cached is not None:
+            call.cache_hit()
+            response = json_type.model_validate_json(cached)
+            yield response.model_dump()
+            return response
 
-    # Call OpenAI to generate room details
-    completion = client.chat.completions.create(**prompt)
-    response = completion.choices[0].message.content
-    return response
\ No newline at end of file
+        snapshot = ""
+        for chunk in guarded_stream(prompt, lambda: get_backend().stream(prompt, json_type)):
+            call.first_token()
+            snapshot += chunk
+            if snapshot.strip():
+                yield from_json(snapshot.encode("utf-8"), partial_mode="trailing-strings")
+        call.completion(snapshot)
+        response = json_type.model_validate_json(snapshot)
+        if cache:
+            put_cached_response(key, response.model_dump_json())
+        return response
@@ -0,0 +1,63 @@
+"""World population cost: per-entity inserts vs. the bulk executemany helpers.
+
+Rooms are inserted with add_rooms_to_db in both runs; monsters and items are
+compared between one add_*_to_db call (and commit) each and one bulk call.
+
+Usage: python benchmarks/bench_bulk_insert.py [--rooms 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_functions
+from db_functions import configure_database, initialize_database
+from db_functions import add_monster_to_db, add_monsters_to_db, add_item_to_db, add_items_to_db, add_rooms_to_db
+from generators import generate_dungeon_with_cycles
+
+
+def populate_one_by_one(monsters, items):
+    for monster in monsters:
+        add_monster_to_db(*monster)
+    for name, description, room_id, is_sword in items:
+        add_item_to_db(name, description, room_id, is_sword)
+
+
+def populate_bulk(monsters, items):
+    add_monsters_to_db(monsters)
+    add_items_to_db(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=10000)
+    args = parser.parse_args()
+
+    rooms = generate_dungeon_with_cycles(args.rooms, args.rooms // 2, args.rooms // 10, (3, 5))
+    room_ids = list(range(2, args.rooms + 1))
+    monster_rooms = random.sample(room_ids, len(room_ids) // 2)
+    item_rooms = random.sample(room_ids, len(room_ids) // 2)
+    monsters = [("Goblin", "A goblin.", room_id, 10, 3) for room_id in monster_rooms]
+    items = [("Sword", "A sword.", room_id, True) for room_id in item_rooms]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, populate in (("one by one", populate_one_by_one), ("bulk", populate_bulk)):
+            configure_database(os.path.join(tmp, label.replace(" ", "_") + ".db"))
+            initialize_database(num_rooms=1, main_cycle_size=1, num_subcycles=0)
+            start = time.perf_counter()
+            add_rooms_to_db(rooms[1:])
+            rooms_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            populate(monsters, items)
+            entities_ms = (time.perf_counter() - start) * 1000
+            print(f"{label:<12} {len(rooms)} rooms: {rooms_ms:8.1f} ms   "
+                  f"{len(monsters)} monsters + {len(items)} items: {entities_ms:9.1f} ms")
+            db_functions.close_db_connection()
+
+
+if __name__ == "__main__":
+    main()
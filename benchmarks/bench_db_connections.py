@@ -0,0 +1,108 @@
+"""Per-turn database latency: connect-per-call vs. persistent connections
+vs. the write-behind game state cache.
+
+Replays the database work of one room visit (``get_room_description`` plus the
+direction buttons in ``shadows.py``) against a scratch database.
+
+Usage: python benchmarks/bench_db_connections.py [--turns 200]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_functions
+from db_functions import configure_database, configure_state_cache, flush_game_state, initialize_database
+from db_functions import get_room_info, get_monsters_in_room, update_room_visited, update_room_name_and_description
+
+
+def legacy_query(path, sql, params=(), write=False):
+    """The old access pattern: open, run one statement, commit, close."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    if write:
+        conn.commit()
+    conn.close()
+    return rows
+
+
+def legacy_turn(path, room_id):
+    room = legacy_query(path, "SELECT name, description, visited, connections FROM rooms WHERE id = ?", (room_id,))[0]
+    neighbor_ids = json.loads(room["connections"])
+    legacy_query(path, "SELECT id, name, description, hp, attack, defeated FROM monsters WHERE room_id = ?", (room_id,))
+    for neighbor_id in neighbor_ids:
+        legacy_query(path, "SELECT id, name, description, hp, attack, defeated FROM monsters WHERE room_id = ?", (neighbor_id,))
+    legacy_query(path, "UPDATE rooms SET name = ?, description = ? WHERE id = ?", ("Hall", "A hall.", room_id), write=True)
+    legacy_query(path, "UPDATE rooms SET visited = ? WHERE id = ?", (True, room_id), write=True)
+    legacy_query(path, "SELECT name, description, visited, connections FROM rooms WHERE id = ?", (room_id,))
+    for neighbor_id in neighbor_ids:
+        legacy_query(path, "SELECT name, description, visited, connections FROM rooms WHERE id = ?", (neighbor_id,))
+    return neighbor_ids
+
+
+def pooled_turn(room_id):
+    room = get_room_info(room_id)
+    neighbor_ids = json.loads(room["connections"])
+    get_monsters_in_room(room_id)
+    for neighbor_id in neighbor_ids:
+        get_monsters_in_room(neighbor_id)
+    update_room_name_and_description(room_id, "Hall", "A hall.")
+    update_room_visited(room_id, True)
+    get_room_info(room_id)
+    for neighbor_id in neighbor_ids:
+        get_room_info(neighbor_id)
+    return neighbor_ids
+
+
+def run(turn, turns):
+    """Walk the dungeon for ``turns`` moves and return per-turn latencies in ms."""
+    timings = []
+    room_id = 1
+    for i in range(turns):
+        start = time.perf_counter()
+        neighbor_ids = turn(room_id)
+        timings.append((time.perf_counter() - start) * 1000)
+        room_id = neighbor_ids[i % len(neighbor_ids)]
+    return sorted(timings)
+
+
+def report(label, timings):
+    p50 = timings[len(timings) // 2]
+    p95 = timings[int(len(timings) * 0.95)]
+    print(f"{label:<22} mean {sum(timings) / len(timings):7.3f} ms   p50 {p50:7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        configure_database(path)
+        initialize_database()
+
+        report("connect per call", run(lambda room_id: legacy_turn(path, room_id), args.turns))
+        report("persistent connection", run(pooled_turn, args.turns))
+
+        def cached_turn(room_id):
+            neighbor_ids = pooled_turn(room_id)
+            flush_game_state()
+            return neighbor_ids
+
+        configure_state_cache(durability="turn")
+        report("state cache (turn)", run(cached_turn, args.turns))
+        configure_state_cache(durability="off")
+        db_functions.close_db_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Dungeon generation time and memory: dict-of-sets generator vs. CSR NumPy arrays.
+
+Both generators build the same kind of layout (a main cycle of half the rooms
+plus subcycles of 3-5 rooms covering most of the rest) at increasing sizes.
+Peak memory is measured with tracemalloc, which NumPy reports its buffers to.
+The old generator is quadratic in the number of subcycles, so it is skipped
+above --legacy-max rooms. Each CSR layout is checked for symmetry and for the
+main cycle before it is timed.
+
+Usage: python benchmarks/bench_dungeon_graph.py [--sizes 1000 10000 50000 100000] [--legacy-max 20000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generators import generate_dungeon_with_cycles
+from dungeon_graph import generate_dungeon_csr, csr_neighbors, csr_edges
+
+
+def layout(num_rooms):
+    """(num_rooms, main_cycle_size, num_subcycles, subcycle_size_range)."""
+    return num_rooms, num_rooms // 2, num_rooms // 8, (3, 5)
+
+
+def measure(generate, *args):
+    """Return (seconds, peak MiB) for one call of generate(*args)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    generate(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def check(num_rooms, main_cycle_size, indptr, indices):
+    src, dst = csr_edges(indptr, indices)
+    forward = set(zip(src.tolist(), dst.tolist()))
+    assert all((v, u) in forward for u, v in forward), "adjacency is not symmetric"
+    for room_id in range(1, main_cycle_size + 1):
+        assert room_id % main_cycle_size + 1 in csr_neighbors(indptr, indices, room_id), "main cycle is broken"
+    assert len(indptr) == num_rooms + 2 and indptr[1] == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rooms':>7} {'edges':>7}   {'sets ms':>9} {'sets MiB':>9}   {'csr ms':>8} {'csr MiB':>8}")
+    for size in args.sizes:
+        indptr, indices = generate_dungeon_csr(*layout(size), seed=args.seed)
+        check(size, layout(size)[1], indptr, indices)
+        assert np.array_equal(indices, generate_dungeon_csr(*layout(size), seed=args.seed)[1]), "seed is not reproducible"
+
+        csr_s, csr_mib = measure(generate_dungeon_csr, *layout(size), args.seed)
+        legacy = "       -         -"
+        if size <= args.legacy_max:
+            legacy_s, legacy_mib = measure(generate_dungeon_with_cycles, *layout(size))
+            legacy = f"{legacy_s * 1000:9.1f} {legacy_mib:9.2f}"
+        print(f"{size:7d} {len(indices):7d}   {legacy}   {csr_s * 1000:8.1f} {csr_mib:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
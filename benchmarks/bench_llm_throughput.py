@@ -0,0 +1,115 @@
+"""Offline game throughput against the local LLM stub.
+
+Simulated players each create their own world and then walk through it, one
+room description per turn, all at once on separate threads. The stub's latency
+is seeded by each request, so runs with the same settings are reproducible.
+
+LLM calls are summarized per generator from llm_metrics; --export writes the
+individual calls to a .csv or .jsonl file.
+
+Usage: python benchmarks/bench_llm_throughput.py [--players 8] [--turns 10] [--latency 0.5]
+                                                [--error-rate 0.1] [--tpm 30000] [--export calls.csv]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import streamlit.logger
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_functions
+from db_functions import use_game, get_neighbor_rooms, flush_game_state, configure_state_cache
+from ai_functions import configure_llm_backend
+from llm_resilience import configure_llm_limits
+from llm_cache import configure_llm_cache
+from llm_metrics import format_summary, export_metrics
+import generators
+
+
+def play(player, turns, stream, timings, seed):
+    """Create a world and walk turns rooms through it, recording turn latencies."""
+    rng = random.Random(seed + player)
+    use_game(f"bench{player}")
+    configure_state_cache(durability="turn")
+    start = time.perf_counter()
+    generators.populate_world()
+    timings["populate"].append(time.perf_counter() - start)
+
+    room_id = 1
+    for _ in range(turns):
+        start = time.perf_counter()
+        if stream:
+            chunks = generators.stream_room_description(room_id)
+            next(chunks)
+            timings["first_text"].append(time.perf_counter() - start)
+            for _ in chunks:
+                pass
+        else:
+            generators.get_room_description(room_id)
+        timings["turn"].append(time.perf_counter() - start)
+        flush_game_state()
+        room_id = rng.choice(get_neighbor_rooms(room_id))["id"]
+    db_functions.close_db_connection()
+
+
+def summary(label, timings):
+    if not timings:
+        return
+    timings = sorted(timings)
+    print(f"{label:<11} n {len(timings):5d}   mean {sum(timings) / len(timings) * 1000:8.1f} ms   "
+          f"p50 {timings[len(timings) // 2] * 1000:8.1f} ms   p95 {timings[int(len(timings) * 0.95)] * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub calls that fail transiently")
+    parser.add_argument("--rpm", type=int, default=1_000_000, help="client-side requests per minute limit")
+    parser.add_argument("--tpm", type=int, default=100_000_000, help="client-side tokens per minute limit")
+    parser.add_argument("--stream", action="store_true", help="use the streaming room descriptions")
+    parser.add_argument("--export", help="write every LLM call to this .csv or .jsonl file")
+    args = parser.parse_args()
+
+    configure_llm_backend("stub", latency=args.latency, jitter=args.jitter, token_delay=args.token_delay,
+                          seed=args.seed, error_rate=args.error_rate)
+    configure_llm_limits(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    streamlit.logger.set_log_level("error")  # Bare-mode warnings from every worker thread
+
+    timings = {"populate": [], "turn": [], "first_text": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        configure_llm_cache(path=os.path.join(tmp, "llm_cache.db"))
+        players = [threading.Thread(target=play, args=(p, args.turns, args.stream, timings, args.seed))
+                   for p in range(args.players)]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # The generators log every prompt
+            for player in players:
+                player.start()
+            for player in players:
+                player.join()
+        elapsed = time.perf_counter() - start
+
+    summary("populate", timings["populate"])
+    summary("turn", timings["turn"])
+    summary("first text", timings["first_text"])
+    print(f"{len(timings['turn']) / elapsed:.1f} turns/s over {elapsed:.2f} s")
+    print()
+    print(format_summary())
+    if args.export:
+        print(f"\n{export_metrics(args.export)} LLM calls written to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
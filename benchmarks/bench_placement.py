@@ -0,0 +1,78 @@
+"""Entity placement cost: random.choice over a rebuilt list per entity vs. one vectorized draw.
+
+For each world size, the same number of entities is placed one per room the
+old way (random.choice(list(available_rooms)) in a loop) and with
+placement.sample_rooms, uniformly and weighted by depth from the entrance.
+Times are per hundred entities. The old loop is skipped above --legacy-max
+rooms.
+
+Usage: python benchmarks/bench_placement.py [--rooms 1000 10000 100000] [--entities 100 1000 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dungeon_graph import generate_dungeon_csr
+from placement import sample_rooms, room_depths, depth_weights
+
+
+def legacy_place(count, num_rooms):
+    available_rooms = set(range(2, num_rooms + 1))
+    placed = []
+    for _ in range(count):
+        room_id = random.choice(list(available_rooms))
+        available_rooms.discard(room_id)
+        placed.append(room_id)
+    return placed
+
+
+def per_hundred(seconds, count):
+    return f"{seconds * 1000 / count * 100:10.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--entities", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rooms':>7} {'entities':>8}   {'loop ms/100':>11} {'draw ms/100':>11} {'depth ms/100':>12}   "
+          f"{'mean depth':>10} {'weighted':>8}")
+    for num_rooms in args.rooms:
+        indptr, indices = generate_dungeon_csr(num_rooms, num_rooms // 2, num_rooms // 8, (3, 5), seed=args.seed)
+        depths = room_depths(indptr, indices)
+        room_ids = np.arange(2, num_rooms + 1)
+        weights = depth_weights(depths)[room_ids]
+        rng = np.random.default_rng(args.seed)
+
+        for count in args.entities:
+            count = min(count, num_rooms - 1)
+            legacy = f"{'-':>10}"
+            if num_rooms <= args.legacy_max:
+                start = time.perf_counter()
+                legacy_place(count, num_rooms)
+                legacy = per_hundred(time.perf_counter() - start, count)
+
+            start = time.perf_counter()
+            uniform = sample_rooms(room_ids, count, rng=rng)
+            uniform_s = time.perf_counter() - start
+            start = time.perf_counter()
+            weighted = sample_rooms(room_ids, count, weights, rng=rng)
+            weighted_s = time.perf_counter() - start
+            assert len(set(uniform.tolist())) == len(uniform) == count, "uniform draw repeated a room"
+            assert len(set(weighted.tolist())) == len(weighted), "weighted draw repeated a room"
+
+            print(f"{num_rooms:7d} {count:8d}   {legacy} {per_hundred(uniform_s, count)} "
+                  f" {per_hundred(weighted_s, count)}   {depths[uniform].mean():10.1f} {depths[weighted].mean():8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Random inventory item sampling: ORDER BY RANDOM() vs. rowid-range lookup.
+
+Usage: python benchmarks/bench_random_item.py [--samples 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_functions
+from db_functions import add_items_to_db, configure_database, get_db_connection, get_random_item, initialize_database
+
+
+def order_by_random():
+    """The previous implementation, kept here for comparison."""
+    cursor = get_db_connection().cursor()
+    cursor.execute("""
+        SELECT i.id, i.name, i.description
+        FROM items i
+        JOIN player_inventory p ON p.item_id = i.id
+        ORDER BY RANDOM()
+        LIMIT 1
+    """)
+    return dict(cursor.fetchone())
+
+
+def time_per_call(sample, samples):
+    start = time.perf_counter()
+    for _ in range(samples):
+        sample()
+    return (time.perf_counter() - start) / samples * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (1000, 10000, 100000):
+            configure_database(os.path.join(tmp, f"inventory_{size}.db"))
+            initialize_database()
+            add_items_to_db([(f"Sword {i}", "A sword.", 2, True) for i in range(size)])
+            conn = get_db_connection()
+            conn.executemany("INSERT INTO player_inventory (item_id) VALUES (?)", [(i,) for i in range(1, size + 1)])
+            conn.commit()
+
+            before = time_per_call(order_by_random, args.samples)
+            after = time_per_call(get_random_item, args.samples)
+            print(f"{size:>7} items   ORDER BY RANDOM() {before:8.3f} ms   rowid range {after:8.3f} ms")
+            db_functions.close_db_connection()
+
+
+if __name__ == "__main__":
+    main()
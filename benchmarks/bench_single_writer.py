@@ -0,0 +1,64 @@
+"""Concurrent write throughput: per-thread writes vs. the single writer thread.
+
+Simulates several Streamlit script threads updating the same game database at
+once. A short busy timeout makes lock contention show up as errors instead of
+long stalls.
+
+Usage: python benchmarks/bench_single_writer.py [--threads 8] [--writes 200] [--busy-timeout 5]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_functions
+from db_functions import add_monsters_to_db, configure_database, initialize_database, update_monster_hp
+
+
+def hammer(num_threads, writes, monster_ids):
+    """Run writes from num_threads threads; return (seconds, lock errors)."""
+    errors = []
+
+    def worker(offset):
+        for i in range(writes):
+            try:
+                update_monster_hp(monster_ids[(offset + i) % len(monster_ids)], i % 10)
+            except sqlite3.OperationalError as exc:
+                errors.append(exc)
+        db_functions.close_db_connection()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--busy-timeout", type=int, default=5, help="milliseconds")
+    args = parser.parse_args()
+
+    total = args.threads * args.writes
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, single_writer in (("per-thread writes", False), ("single writer", True)):
+            configure_database(os.path.join(tmp, f"{label.replace(' ', '_')}.db"),
+                               pragmas={"busy_timeout": args.busy_timeout}, single_writer=single_writer)
+            initialize_database()
+            add_monsters_to_db([("Goblin", "A goblin.", room_id, 10, 3) for room_id in range(2, 26)])
+            elapsed, errors = hammer(args.threads, args.writes, list(range(1, 25)))
+            print(f"{label:<18} {total / elapsed:9.0f} writes/s   {errors} 'database is locked' errors")
+        configure_database(single_writer=False)
+
+
+if __name__ == "__main__":
+    main()
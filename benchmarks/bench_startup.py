@@ -0,0 +1,54 @@
+"""Game startup time: cold start (new world) vs. warm start (existing world).
+
+Each start opens a fresh connection, as a new Streamlit session would.
+
+Usage: python benchmarks/bench_startup.py [--starts 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_functions
+from db_functions import configure_database, initialize_database
+import generators  # Imported up front so module import time isn't counted as a cold start
+
+
+def timed_start(path):
+    configure_database(path)
+    start = time.perf_counter()
+    created = initialize_database()
+    elapsed = (time.perf_counter() - start) * 1000
+    db_functions.close_db_connection()
+    return elapsed, created
+
+
+def summary(label, timings):
+    timings = sorted(timings)
+    print(f"{label:<11} mean {sum(timings) / len(timings):8.3f} ms   p50 {timings[len(timings) // 2]:8.3f} ms   "
+          f"max {timings[-1]:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--starts", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold = [timed_start(os.path.join(tmp, f"cold_{i}.db"))[0] for i in range(args.starts)]
+        warm_path = os.path.join(tmp, "warm.db")
+        timed_start(warm_path)
+        warm = []
+        for _ in range(args.starts):
+            elapsed, created = timed_start(warm_path)
+            assert not created, "warm start rebuilt the world"
+            warm.append(elapsed)
+        summary("cold start", cold)
+        summary("warm start", warm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Fail if room prompts exceed their token budget, and compare with the old JSON encoding.
+
+Rooms of increasing density (neighbors, description length, monsters here and
+next door) are run through prompts.room_prompt. Each prompt must come in at or
+under ROOM_PROMPT_BUDGET. The size of the previous indent=4 JSON prompt for
+the same room is shown alongside for reference.
+
+Usage: python benchmarks/check_prompt_budget.py [--budget 1000]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompts import room_prompt, count_tokens, ROOM_PROMPT_BUDGET, ROOM_SYSTEM_PROMPT
+
+LOREM = ("Moss clings to the cracked flagstones and a thin stream of water cuts across the floor, "
+         "pooling around the bones of something long dead while old dwarven runes glimmer faintly on the walls. ")
+
+# name: (neighbors, description characters, monsters here, monsters per neighbor)
+SCENARIOS = {
+    "sparse": (2, 150, 0, 0),
+    "typical": (3, 300, 1, 1),
+    "dense": (6, 600, 3, 2),
+    "crowded": (10, 800, 5, 4),
+    "extreme": (16, 1200, 8, 6),
+}
+
+
+def text(chars):
+    return (LOREM * (chars // len(LOREM) + 1))[:chars]
+
+
+def build_room(neighbor_count, chars, monsters_here, monsters_per_neighbor):
+    room = {"id": 1, "name": "Hall of the Mountain King", "description": text(chars)}
+    neighbors = [{"id": i, "name": f"Passage {i}" if i % 3 else "", "description": text(chars) if i % 3 else ""}
+                 for i in range(2, neighbor_count + 2)]
+    monster = {"name": "Cave Troll", "description": text(150), "hp": 9, "attack": 7, "defeated": 0}
+    monsters = [dict(monster) for _ in range(monsters_here)]
+    nearby = [dict(monster, room_id=neighbor["id"]) for neighbor in neighbors for _ in range(monsters_per_neighbor)]
+    return room, neighbors, monsters, nearby
+
+
+def legacy_tokens(room, neighbors, monsters, nearby):
+    """Token count of the prompt as it was built before prompts.py."""
+    def monster_json(m):
+        return {"name": m["name"], "description": m["description"], "hp": m["hp"], "defeated": m["defeated"],
+                "attack": m["attack"], "description2": m["description"]}
+    prompt_text = (
+        f"Current room: ID: {room['id']}, Name: {room['name']}, visited: 0\n"
+        f"Description: {room['description']}\n\n"
+        f"Alive monsters in current room:\n{json.dumps([monster_json(m) for m in monsters], indent=4)}\n\n"
+        f"Defeated monsters in current room:\n[]\n\n"
+        f"Neighboring room information:\n{json.dumps(neighbors, indent=4)}\n\n"
+        f"Monsters in neighboring rooms:\n{json.dumps([monster_json(m) for m in nearby], indent=4)}\n\n"
+    )
+    return count_tokens(ROOM_SYSTEM_PROMPT) + count_tokens(prompt_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=int, default=ROOM_PROMPT_BUDGET)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'room':<9} {'tokens':>7} {'level':>6} {'legacy':>7}")
+    for name, shape in SCENARIOS.items():
+        room, neighbors, monsters, nearby = build_room(*shape)
+        _, tokens, level = room_prompt(room, False, monsters, neighbors, nearby, budget=args.budget)
+        status = "ok  " if tokens <= args.budget else "FAIL"
+        failures += tokens > args.budget
+        print(f"{name:<9} {tokens:7d} {level:6d} {legacy_tokens(room, neighbors, monsters, nearby):7d}  {status}")
+
+    if failures:
+        print(f"\n{failures} room prompt(s) over the {args.budget} token budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
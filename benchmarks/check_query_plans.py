@@ -0,0 +1,114 @@
+"""Fail if any query in db_functions/generators falls back to a table scan.
+
+Every SQL string passed to ``execute``/``executemany``/``_write`` in the checked modules is
+collected from the source, bound with dummy parameters and run through
+``EXPLAIN QUERY PLAN`` against a large seeded database. A plan step that SCANs
+a table fails the check unless the query is listed in ``FULL_READS``.
+
+Usage: python benchmarks/check_query_plans.py [--rooms 20000]
+"""
+import argparse
+import ast
+import os
+import random
+import re
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db_functions
+from db_functions import configure_database, get_db_connection, initialize_database
+
+CHECKED_MODULES = ["db_functions.py", "generators.py"]
+
+# Queries that read a whole table on purpose, keyed by their leading text
+FULL_READS = {
+    "SELECT COUNT(*) FROM rooms": "room count for generation prompts",
+    "SELECT COUNT(*) FROM player_stats": "one-row table",
+    "SELECT 1 FROM room_connections LIMIT 1": "emptiness probe, stops at first row",
+    "SELECT 1 FROM rooms LIMIT 1": "emptiness probe, stops at first row",
+    "SELECT id, connections FROM rooms": "one-off JSON migration",
+    "UPDATE rooms SET described_version = 0 WHERE name": "one-off schema 3 migration",
+    "SELECT id FROM rooms": "existing-room filter for bulk room inserts",
+    "SELECT room_id, neighbor_id FROM room_connections ORDER BY": "dungeon map",
+}
+
+
+def normalize(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def collect_queries(path):
+    """Yield (line, sql) for every literal SQL statement executed in a module."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and node.args and (
+                (isinstance(node.func, ast.Attribute) and node.func.attr in ("execute", "executemany"))
+                or (isinstance(node.func, ast.Name) and node.func.id == "_write"))):
+            continue
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            sql = arg.value
+        elif (isinstance(arg, ast.Call) and isinstance(arg.func, ast.Attribute) and arg.func.attr == "format"
+              and isinstance(arg.func.value, ast.Constant)):
+            # "... IN ({})".format(",".join("?" * n)) style placeholders
+            sql = arg.func.value.value.replace("{}", "?")
+        else:
+            continue
+        sql = normalize(sql)
+        if re.match(r"(SELECT|UPDATE|DELETE)\b", sql, re.IGNORECASE) or re.search(r"\bSELECT\b", sql):
+            yield node.lineno, sql
+
+
+def seed(num_rooms):
+    """Populate the scratch database with a large world."""
+    from generators import generate_dungeon_with_cycles
+    initialize_database(num_rooms=25)
+    conn = get_db_connection()
+    rooms = generate_dungeon_with_cycles(num_rooms, num_rooms // 2, num_rooms // 10, (3, 5))
+    db_functions.add_rooms_to_db(rooms[25:])
+    room_ids = range(2, num_rooms + 1)
+    db_functions.add_monsters_to_db([("Goblin", "A goblin.", random.choice(room_ids), 10, 3) for _ in range(num_rooms)])
+    db_functions.add_items_to_db([("Sword", "A sword.", random.choice(room_ids), True) for _ in range(num_rooms)])
+    conn.executemany("INSERT INTO player_inventory (item_id) VALUES (?)",
+                     [(item_id,) for item_id in range(1, num_rooms // 2)])
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=20000)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_database(os.path.join(tmp, "plans.db"))
+        seed(args.rooms)
+        conn = get_db_connection()
+        for module in CHECKED_MODULES:
+            for line, sql in collect_queries(os.path.join(ROOT, module)):
+                params = [1] * sql.count("?")
+                plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+                scans = [step for step in plan if step.startswith("SCAN") and step != "SCAN CONSTANT ROW"]
+                allowed = next((reason for prefix, reason in FULL_READS.items() if sql.startswith(prefix)), None)
+                if scans and not allowed:
+                    failures += 1
+                    status = "FAIL"
+                else:
+                    status = "ok  " if not scans else "full"
+                print(f"{status} {module}:{line}  {sql[:80]}")
+                for step in plan:
+                    print(f"         {step}")
+        db_functions.close_db_connection()
+
+    if failures:
+        print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} fell back to a table scan")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
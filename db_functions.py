@@ -1,190 +1,863 @@
 import sqlite3
+import threading
+import queue
+import json
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from pydantic_types import RoomContext
 
 # Database Utility Functions
 
+DB_PATH = "adventure_game.db"
+
+# Bump when initialize_database() gains tables, columns or migrations
+SCHEMA_VERSION = 3
+
+# Each game gets its own database file here, see use_game()
+GAMES_DIR = "games"
+
+# PRAGMAs applied once when a connection is opened
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -8000,  # Negative values are in KiB
+}
+
+# One long-lived connection per thread, keyed by database path
+_local = threading.local()
+
 # General Connection Function
 
-def get_db_connection():
-    conn = sqlite3.connect("adventure_game.db", check_same_thread=False)
+# Route writes through one background writer thread per database file. Opt-in:
+# it avoids 'database is locked' errors under heavy write contention, but at the
+# current load it is slower than per-thread writes (benchmarks/bench_single_writer.py)
+SINGLE_WRITER = False
+WRITER_IDLE_TIMEOUT = 60.0  # Seconds a writer thread waits for work before it exits
+
+def configure_database(path=None, pragmas=None, single_writer=None):
+    """Set the database path, PRAGMAs used for new connections and/or writer mode."""
+    global DB_PATH, SINGLE_WRITER
+    if path is not None:
+        DB_PATH = path
+    if pragmas is not None:
+        DB_PRAGMAS.update(pragmas)
+    if single_writer is not None:
+        SINGLE_WRITER = single_writer
+
+def use_game(game_id):
+    """Point the calling thread's helpers at the database file for game_id.
+
+    Every game lives in its own SQLite file, so concurrent players never share
+    rows or a write lock. Pass None to go back to DB_PATH.
+    """
+    if game_id is not None:
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", game_id):
+            raise ValueError(f"Invalid game id: {game_id!r}")
+        os.makedirs(GAMES_DIR, exist_ok=True)
+    _local.game_id = game_id
+
+def current_game_id():
+    return getattr(_local, "game_id", None)
+
+def current_db_path():
+    game_id = current_game_id()
+    if game_id is None:
+        return DB_PATH
+    return os.path.join(GAMES_DIR, f"{game_id}.db")
+
+def _connect(path, **kwargs):
+    conn = sqlite3.connect(path, check_same_thread=False, **kwargs)
     conn.row_factory = sqlite3.Row  # This enables fetching rows as dictionaries
+    for pragma, value in DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+    return conn
+
+def get_db_connection():
+    """Return this thread's persistent connection, opening it on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    path = current_db_path()
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = _connect(path)
     return conn
 
+def close_db_connection():
+    """Close every connection held by the calling thread."""
+    connections = getattr(_local, "connections", {})
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+# Single Writer
+
+class DBWriter:
+    """Background thread that owns the write connection for one database file.
+
+    Jobs are lists of (sql, params, many) statements, applied in submission
+    order. Jobs that queue up while a commit is running are group-committed
+    together, each inside its own SAVEPOINT so one failing job doesn't undo
+    the others. Readers keep their own connections and stay concurrent under WAL.
+    After WRITER_IDLE_TIMEOUT seconds without work the thread exits and the
+    writer is dropped, so finished games don't keep a thread each.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=f"db-writer-{os.path.basename(path)}", daemon=True)
+        self.thread.start()
+
+    def submit(self, statements):
+        """Queue a job; call with _writers_lock held (see _submit_write_job)."""
+        future = Future()
+        self.queue.put((statements, future))
+        return future
+
+    def _run(self):
+        conn = _connect(self.path, isolation_level=None)  # Transactions are managed explicitly
+        while True:
+            try:
+                jobs = [self.queue.get(timeout=WRITER_IDLE_TIMEOUT)]
+            except queue.Empty:
+                # Jobs are only queued under _writers_lock, so none can slip in after this check
+                with _writers_lock:
+                    if self.queue.empty():
+                        if _writers.get(self.path) is self:
+                            del _writers[self.path]
+                        break
+                continue
+            while True:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            outcomes = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for statements, future in jobs:
+                    outcomes.append((future, *self._apply(conn, statements)))
+                conn.execute("COMMIT")
+            except Exception as exc:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                outcomes = [(future, None, exc) for _, future in jobs]
+            for future, result, exc in outcomes:
+                if exc is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exc)
+        conn.close()
+
+    @staticmethod
+    def _apply(conn, statements):
+        """Run one job in a savepoint; return (rowcount, exception)."""
+        conn.execute("SAVEPOINT job")
+        try:
+            rowcount = None
+            for sql, params, many in statements:
+                cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+                rowcount = cursor.rowcount
+        except sqlite3.Error as exc:
+            conn.execute("ROLLBACK TO job")
+            conn.execute("RELEASE job")
+            return None, exc
+        conn.execute("RELEASE job")
+        return rowcount, None
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def _submit_write_job(statements):
+    """Queue a job on the current database's writer, starting one if there is none."""
+    path = current_db_path()
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = DBWriter(path)
+        return writer.submit(statements)
+
+def submit_write(sql, params=(), many=False):
+    """Queue one write statement and return a Future for its rowcount.
+
+    Without the single writer (or inside a transaction() block) the statement
+    is handled like any helper write and the returned Future is already resolved.
+    """
+    if SINGLE_WRITER and not getattr(_local, "tx_depth", 0):
+        return _submit_write_job([(sql, params, many)])
+    future = Future()
+    future.set_result(_write(sql, params, many))
+    return future
+
+def _write(sql, params=(), many=False):
+    """Run one write statement and wait until it is applied.
+
+    Inside a transaction() block the statement joins the block's commit.
+    """
+    if not SINGLE_WRITER:
+        conn = get_db_connection()
+        cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+        _commit(conn)
+        return cursor.rowcount
+    if getattr(_local, "tx_depth", 0):
+        _local.tx_writes.append((sql, params, many))
+        return None
+    return _submit_write_job([(sql, params, many)]).result()
+
+# Transactions
+
+@contextmanager
+def transaction():
+    """Run the enclosed helper calls as one atomic unit with a single commit.
+
+    Helpers called inside the block skip their own commit. Blocks may nest;
+    only the outermost one commits, and an exception rolls everything back.
+    With the single writer the block's writes go to the writer thread as one
+    job when it exits, so reads inside the block don't see them yet. Cached
+    rows are updated only once the block commits (see _on_commit).
+    """
+    conn = get_db_connection()
+    depth = getattr(_local, "tx_depth", 0)
+    if depth == 0:
+        _local.tx_writes = []
+        _local.tx_on_commit = []
+    _local.tx_depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        raise
+    else:
+        if depth == 0:
+            if _local.tx_writes:
+                _submit_write_job(_local.tx_writes).result()
+            conn.commit()
+            callbacks = _local.tx_on_commit
+            _local.tx_on_commit = []
+            for callback in callbacks:
+                callback()
+    finally:
+        _local.tx_depth = depth
+        if depth == 0:
+            _local.tx_writes = []
+            _local.tx_on_commit = []
+
+def _on_commit(callback):
+    """Call callback once the enclosing transaction() block commits, or now outside one.
+
+    A rolled back block drops its callbacks, so in-memory state never gets
+    ahead of what SQLite actually holds.
+    """
+    if getattr(_local, "tx_depth", 0):
+        _local.tx_on_commit.append(callback)
+    else:
+        callback()
+
+def _commit(conn):
+    """Commit unless the caller is inside a transaction() block."""
+    if not getattr(_local, "tx_depth", 0):
+        conn.commit()
+
+# Game State Cache
+
+# Durability of the write-behind cache:
+#   "off"       - no cache, every helper reads and writes SQLite directly
+#   "immediate" - reads are served from memory, writes go straight through
+#   "interval"  - writes are flushed once flush_interval seconds have passed
+#   "turn"      - writes are flushed when flush_game_state() is called
+STATE_CACHE = {
+    "durability": "off",
+    "flush_interval": 5.0,
+    "max_games": 64,  # Games kept in memory; the least recently used clean one is dropped
+}
+
+# Columns kept in memory for each cached table
+_CACHED_COLUMNS = {
+    "rooms": ("name", "description", "visited", "connections"),
+    "player_stats": ("hp", "attack", "defense"),
+    "monsters": ("id", "name", "description", "room_id", "full_hp", "hp", "attack", "defeated"),
+}
+
+class GameStateCache:
+    """In-memory copy of the hot rows of one game database, with dirty tracking."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.rows = {table: {} for table in _CACHED_COLUMNS}
+        self.room_monsters = {}  # room_id -> [monster_id, ...]
+        self.dirty = {}  # (table, row_id) -> {column, ...}
+        self.last_flush = time.monotonic()
+        self.evicted = False  # Dropped from _caches; writes must go straight to SQLite
+
+_caches = OrderedDict()  # Database path -> GameStateCache, least recently used first
+_caches_lock = threading.Lock()
+
+def configure_state_cache(durability=None, flush_interval=None, max_games=None):
+    """Set the write-behind cache durability, flush interval (seconds) and/or max_games."""
+    if durability is not None:
+        if durability not in ("off", "immediate", "interval", "turn"):
+            raise ValueError(f"Unknown durability: {durability}")
+        STATE_CACHE["durability"] = durability
+    if flush_interval is not None:
+        STATE_CACHE["flush_interval"] = flush_interval
+    if max_games is not None:
+        STATE_CACHE["max_games"] = max_games
+
+def _state_cache():
+    """The cache for the current game database, or None when caching is off."""
+    if STATE_CACHE["durability"] == "off":
+        return None
+    path = current_db_path()
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = GameStateCache()
+            _evict_state_caches()
+        else:
+            _caches.move_to_end(path)
+    return cache
+
+def _evict_state_caches():
+    """Drop the least recently used caches beyond max_games; call with _caches_lock held.
+
+    Every session plays its own game, so without this a long-running server
+    would keep every game it ever served. Caches with unflushed writes are
+    kept until a flush has written them.
+    """
+    excess = len(_caches) - STATE_CACHE["max_games"]
+    for path, cache in list(_caches.items())[:-1]:  # Never the one just added
+        if excess <= 0:
+            break
+        with cache.lock:
+            if cache.dirty:
+                continue
+            cache.evicted = True
+        del _caches[path]
+        excess -= 1
+
+def _project(row, columns):
+    return {column: row[column] for column in columns}
+
+def _cached_row(table, row_id, sql, columns):
+    """Return a cached row, loading it with sql (selecting all cached columns) on a miss."""
+    cache = _state_cache()
+    if cache is not None:
+        with cache.lock:
+            row = cache.rows[table].get(row_id)
+            if row is not None:
+                return _project(row, columns)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, (row_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None  # Return None if no data is found
+    row = dict(row)
+    if cache is not None:
+        with cache.lock:
+            row = cache.rows[table].setdefault(row_id, row)  # Never clobber a dirty copy
+            return _project(row, columns)
+    return _project(row, columns)
+
+def _defer_write(table, row_id, values, load):
+    """Apply values to the cached row and defer the SQL write.
+
+    Returns False when the caller should write to SQLite itself: caching is off
+    or the caller is inside a transaction() block and needs the write now.
+    """
+    cache = _state_cache()
+    if cache is None:
+        return False
+    if getattr(_local, "tx_depth", 0):
+        _refresh_cached_row(table, row_id, values)
+        return False
+    if load(row_id) is None:
+        return False
+    with cache.lock:
+        if cache.evicted:
+            return False
+        cache.rows[table][row_id].update(values)
+        cache.dirty.setdefault((table, row_id), set()).update(values)
+        durability = STATE_CACHE["durability"]
+        due = durability == "immediate" or (
+            durability == "interval" and time.monotonic() - cache.last_flush >= STATE_CACHE["flush_interval"])
+    if due:
+        flush_game_state()
+    return True
+
+def _refresh_cached_row(table, row_id, values):
+    """Keep a cached row in step with a write made directly to SQLite, once it commits."""
+    cache = _state_cache()
+    if cache is None:
+        return
+    def refresh():
+        with cache.lock:
+            row = cache.rows[table].get(row_id)
+            if row is not None:
+                row.update(values)
+    _on_commit(refresh)
+
+def _reload_cached_row(table, row_id, columns):
+    """Re-read columns of a cached row from SQLite once the write commits.
+
+    For conditional writes, where the caller can't tell what was stored.
+    """
+    cache = _state_cache()
+    if cache is None:
+        return
+    def reload():
+        row = get_db_connection().execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (row_id,)).fetchone()
+        with cache.lock:
+            cached = cache.rows[table].get(row_id)
+            if cached is not None and row is not None:
+                cached.update(dict(row))
+    _on_commit(reload)
+
+def _forget_room_monsters(room_ids):
+    """Drop cached monster lists for rooms that just gained monsters, once the insert commits."""
+    cache = _state_cache()
+    if cache is None:
+        return
+    def forget():
+        with cache.lock:
+            for room_id in room_ids:
+                cache.room_monsters.pop(room_id, None)
+    _on_commit(forget)
+
+def flush_game_state():
+    """Write every dirty cached row to SQLite in one transaction."""
+    cache = _state_cache()
+    if cache is None:
+        return
+    with cache.lock:
+        dirty, cache.dirty = cache.dirty, {}
+        cache.last_flush = time.monotonic()
+        updates = {}  # (table, column) -> [(value, row_id), ...]
+        for (table, row_id), columns in dirty.items():
+            row = cache.rows[table][row_id]
+            for column in columns:
+                updates.setdefault((table, column), []).append((row[column], row_id))
+    if not updates:
+        return
+    try:
+        with transaction():
+            for (table, column), params in updates.items():
+                _write(f"UPDATE {table} SET {column} = ? WHERE id = ?", params, many=True)
+    except BaseException:
+        # Put the rows back so the next flush retries them
+        with cache.lock:
+            for key, columns in dirty.items():
+                cache.dirty.setdefault(key, set()).update(columns)
+        raise
+
 # Rooms
 
 def add_rooms_to_db(rooms):
     conn = get_db_connection()
     cursor = conn.cursor()
-    for room in rooms:
-        cursor.execute('''
+    # Only insert (and record adjacency for) rooms that don't exist yet
+    cursor.execute("SELECT id FROM rooms")
+    existing = {row[0] for row in cursor.fetchall()}
+    new_rooms = [room for room in rooms if room[0] not in existing]
+    with transaction():
+        _write('''
             INSERT OR IGNORE INTO rooms (id, name, description, connections, visited) 
-            VALUES (?, ?, ?, ?, ?)''', room)
-    conn.commit()
-    conn.close()
+            VALUES (?, ?, ?, ?, ?)''', new_rooms, many=True)
+        _write(
+            "INSERT OR IGNORE INTO room_connections (room_id, neighbor_id) VALUES (?, ?)",
+            [(room[0], neighbor_id) for room in new_rooms for neighbor_id in json.loads(room[3])], many=True)
 
-def update_room_visited(room_id, visited):
+def migrate_room_connections():
+    """Fill room_connections from the legacy JSON column of an existing database."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("UPDATE rooms SET visited = ? WHERE id = ?", (visited, room_id))
-    conn.commit()
-    conn.close()
-
-def update_room_name_and_description(room_id, name, description):
+    cursor.execute("SELECT 1 FROM room_connections LIMIT 1")
+    if cursor.fetchone():
+        return
+    cursor.execute("SELECT id, connections FROM rooms")
+    edges = [(room_id, neighbor_id) for room_id, connections in cursor.fetchall()
+             for neighbor_id in json.loads(connections)]
+    _write("INSERT OR IGNORE INTO room_connections (room_id, neighbor_id) VALUES (?, ?)", edges, many=True)
+
+def migrate_room_versions():
+    """Add the state_version (schema 2) and described_version (schema 3) columns to an older rooms table."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute("PRAGMA table_info(rooms)")
+    columns = {column['name'] for column in cursor.fetchall()}
+    if "state_version" not in columns:
+        _write("ALTER TABLE rooms ADD COLUMN state_version INTEGER NOT NULL DEFAULT 0")
+    if "described_version" not in columns:
+        _write("ALTER TABLE rooms ADD COLUMN described_version INTEGER")
+        if get_world_meta("pregenerated") == "1":
+            # pregenerate.py runs before play, so its descriptions were written at version 0
+            _write("UPDATE rooms SET described_version = 0 WHERE name != ''")
+
+def bump_room_state(room_id):
+    """Mark the descriptions of room_id and its neighbors stale, since they all mention what is in it."""
+    _write("""
+        UPDATE rooms SET state_version = state_version + 1
+        WHERE id = ? OR id IN (SELECT neighbor_id FROM room_connections WHERE room_id = ?)
+    """, (room_id, room_id))
+
+def mark_room_described(room_id, state_version):
+    """Record that room_id's stored description was written for state_version."""
+    _write("UPDATE rooms SET described_version = ? WHERE id = ?", (state_version, room_id))
+
+def update_room_visited(room_id, visited):
+    if _defer_write("rooms", room_id, {"visited": visited}, get_room_info):
+        return
+    _write("UPDATE rooms SET visited = ? WHERE id = ?", (visited, room_id))
+
+def update_room_name_and_description(room_id, name, description):
+    _write("""
         UPDATE rooms
         SET name = CASE WHEN name = 'Unknown' OR ? != name THEN ? ELSE name END,
             description = ?
         WHERE id = ?
     """, (name, name, description, room_id))
-    conn.commit()
-    conn.close()
+    _refresh_cached_row("rooms", room_id, {"name": name, "description": description})
+
+def update_unnamed_room(room_id, name, description):
+    """Name and describe room_id unless it has a name already, so the first name given sticks.
+
+    A prefetch and a foreground describe can both name the same unexplored
+    neighbor; whichever commits second leaves it alone, so a label the player
+    has seen doesn't change.
+    """
+    _write("""
+        UPDATE rooms SET name = ?, description = ?
+        WHERE id = ? AND (name = '' OR name = 'Unknown')
+    """, (name, description, room_id))
+    _reload_cached_row("rooms", room_id, ("name", "description"))
+
+def update_room_names_and_descriptions(rooms):
+    """Set name and description for many (room_id, name, description) tuples in one transaction.
+
+    The descriptions count as written for each room's current state_version.
+    """
+    with transaction():
+        _write("UPDATE rooms SET name = ?, description = ?, described_version = state_version WHERE id = ?",
+               [(name, description, room_id) for room_id, name, description in rooms], many=True)
+    for room_id, name, description in rooms:
+        _refresh_cached_row("rooms", room_id, {"name": name, "description": description})
 
 def update_room_name(room_id, name):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE rooms SET name = ? WHERE id = ?", (name, room_id))
-    conn.commit()
-    conn.close()
+    _write("UPDATE rooms SET name = ? WHERE id = ?", (name, room_id))
+    _refresh_cached_row("rooms", room_id, {"name": name})
 
 def update_room_description(room_id, description):
+    _write("UPDATE rooms SET description = ? WHERE id = ?", (description, room_id))
+    _refresh_cached_row("rooms", room_id, {"description": description})
+
+def get_room_info(room_id):
+    return _cached_row("rooms", room_id,
+                       "SELECT name, description, visited, connections FROM rooms WHERE id = ?",
+                       _CACHED_COLUMNS["rooms"])
+
+def get_neighbor_rooms(room_id):
+    flush_game_state()  # The JOIN reads visited straight from SQLite
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.id, r.name, r.description, r.visited
+        FROM room_connections c
+        JOIN rooms r ON r.id = c.neighbor_id
+        WHERE c.room_id = ?
+        ORDER BY r.id
+    """, (room_id,))
+    return [dict(room) for room in cursor.fetchall()]
+
+def load_room_context(room_id):
+    """Load room_id, its neighbors and all of their monsters and items as a RoomContext.
+
+    Two queries: one for the rooms, one for the monsters and items in them.
+    Returns None if the room doesn't exist.
+    """
+    flush_game_state()  # visited, hp and defeated are read straight from SQLite
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("UPDATE rooms SET description = ? WHERE id = ?", (description, room_id))
-    conn.commit()
-    conn.close()
+    cursor.execute("""
+        SELECT 0 AS is_neighbor, id, name, description, visited, state_version, described_version
+        FROM rooms WHERE id = ?
+        UNION ALL
+        SELECT 1, r.id, r.name, r.description, r.visited, r.state_version, r.described_version
+        FROM room_connections c
+        JOIN rooms r ON r.id = c.neighbor_id
+        WHERE c.room_id = ?
+        ORDER BY is_neighbor, id
+    """, (room_id, room_id))
+    rooms = [dict(row) for row in cursor.fetchall()]
+    if not rooms or rooms[0]['is_neighbor']:
+        return None
+
+    # Monsters and items share one result; the columns the other kind lacks are NULL
+    cursor.execute("""
+        SELECT 'monster' AS kind, id, room_id, name, description, full_hp, hp, attack,
+               COALESCE(defeated, 0) AS defeated, NULL AS is_sword, NULL AS is_claimed
+        FROM monsters
+        WHERE room_id = ? OR room_id IN (SELECT neighbor_id FROM room_connections WHERE room_id = ?)
+        UNION ALL
+        SELECT 'item', id, room_id, name, description, NULL, NULL, NULL, NULL,
+               COALESCE(is_sword, 0), COALESCE(is_claimed, 0)
+        FROM items
+        WHERE room_id = ? OR room_id IN (SELECT neighbor_id FROM room_connections WHERE room_id = ?)
+        ORDER BY kind, room_id, id
+    """, (room_id, room_id, room_id, room_id))
+    entities = [dict(row) for row in cursor.fetchall()]
+
+    return RoomContext(
+        room=rooms[0],
+        neighbors=rooms[1:],
+        monsters=[entity for entity in entities if entity['kind'] == 'monster'],
+        items=[entity for entity in entities if entity['kind'] == 'item'],
+    )
 
-def get_room_info(room_id):
+def get_all_room_connections():
+    """Return {room_id: [neighbor_id, ...]} for the whole dungeon."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT name, description, visited, connections FROM rooms WHERE id = ?", (room_id,))
-    room_info = cursor.fetchone()
-    conn.close()
-    if room_info:
-        return dict(room_info)  # Convert the Row object to a dictionary
-    return None  # Return None if no data is found
+    cursor.execute("SELECT room_id, neighbor_id FROM room_connections ORDER BY room_id, neighbor_id")
+    connections = {}
+    for room_id, neighbor_id in cursor.fetchall():
+        connections.setdefault(room_id, []).append(neighbor_id)
+    return connections
 
 # Player
 
 def fetch_player_stats():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT hp, attack, defense FROM player_stats WHERE id = 1")
-    stats = cursor.fetchone()
-    conn.close()
-    if stats:
-        return dict(stats)  # Convert the Row object to a dictionary
-    return None  # Return None if no data is found
+    return _cached_row("player_stats", 1,
+                       "SELECT hp, attack, defense FROM player_stats WHERE id = ?",
+                       _CACHED_COLUMNS["player_stats"])
 
 def update_player_hp(hp):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE player_stats SET hp = ? WHERE id = 1", (hp,))
-    conn.commit()
-    conn.close()
+    if _defer_write("player_stats", 1, {"hp": hp}, lambda _: fetch_player_stats()):
+        return
+    _write("UPDATE player_stats SET hp = ? WHERE id = 1", (hp,))
 
 # Monsters
 
 def add_monster_to_db(name, description, room_id, full_hp, attack):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
+    _write('''
         INSERT OR IGNORE INTO monsters (id, name, description, room_id, full_hp, hp, attack, defeated) 
         VALUES (NULL, ?, ?, ?, ?, ?, ?, NULL)
         ''', (name, description, room_id, full_hp, full_hp, attack))
-    conn.commit()
-    conn.close()
+    _forget_room_monsters([room_id])
+
+def add_monsters_to_db(monsters):
+    """Insert (name, description, room_id, full_hp, attack) tuples in one transaction."""
+    with transaction():
+        _write('''
+            INSERT OR IGNORE INTO monsters (id, name, description, room_id, full_hp, hp, attack, defeated) 
+            VALUES (NULL, ?, ?, ?, ?, ?, ?, NULL)
+            ''', [(name, description, room_id, full_hp, full_hp, attack)
+                  for name, description, room_id, full_hp, attack in monsters], many=True)
+    _forget_room_monsters({monster[2] for monster in monsters})
 
 def fetch_monster_info(monster_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, description, full_hp, hp, attack, defeated FROM monsters WHERE id = ?", (monster_id,))
-    monster_info = cursor.fetchone()
-    conn.close()
-    if monster_info:
-        return dict(monster_info)  # Convert the Row object to a dictionary
-    return None  # Return None if no data is found
+    return _cached_row("monsters", monster_id,
+                       "SELECT id, name, description, room_id, full_hp, hp, attack, defeated FROM monsters WHERE id = ?",
+                       ("name", "description", "full_hp", "hp", "attack", "defeated"))
 
 def get_monsters_in_room(room_id):
+    columns = ("id", "name", "description", "hp", "attack", "defeated")
+    cache = _state_cache()
+    if cache is not None:
+        with cache.lock:
+            monster_ids = cache.room_monsters.get(room_id)
+            if monster_ids is not None:
+                return [_project(cache.rows["monsters"][monster_id], columns) for monster_id in monster_ids]
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, description, hp, attack, defeated FROM monsters WHERE room_id = ?", (room_id,))
-    monsters = cursor.fetchall()
-    conn.close()
-    return [dict(monster) for monster in monsters]  # Convert each Row object to a dictionary
+    cursor.execute("SELECT id, name, description, room_id, full_hp, hp, attack, defeated FROM monsters WHERE room_id = ?", (room_id,))
+    monsters = [dict(monster) for monster in cursor.fetchall()]  # Convert each Row object to a dictionary
+    if cache is not None:
+        with cache.lock:
+            monsters = [cache.rows["monsters"].setdefault(monster["id"], monster) for monster in monsters]
+            cache.room_monsters[room_id] = [monster["id"] for monster in monsters]
+            return [_project(monster, columns) for monster in monsters]
+    return [_project(monster, columns) for monster in monsters]
 
 def update_monster_hp(monster_id, hp):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE monsters SET hp = ? WHERE id = ?", (hp, monster_id))
-    conn.commit()
-    conn.close()
+    if _defer_write("monsters", monster_id, {"hp": hp}, fetch_monster_info):
+        return
+    _write("UPDATE monsters SET hp = ? WHERE id = ?", (hp, monster_id))
 
 def mark_monster_defeated(monster_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE monsters SET defeated = 1 WHERE id = ?", (monster_id,))
-    conn.commit()
-    conn.close()
+    """Mark a monster defeated and the narration of its room stale.
+
+    Both land in one transaction and aren't deferred, so a description loaded
+    in between can never pair the new state version with a living monster.
+    """
+    monster = _cached_row("monsters", monster_id,
+                          "SELECT id, name, description, room_id, full_hp, hp, attack, defeated FROM monsters WHERE id = ?",
+                          ("room_id",))
+    with transaction():
+        _write("UPDATE monsters SET defeated = 1 WHERE id = ?", (monster_id,))
+        if monster is not None:
+            bump_room_state(monster['room_id'])
+        _refresh_cached_row("monsters", monster_id, {"defeated": 1})
+
+def defeat_monster(monster_id, player_hp, item_id=None):
+    """Apply a won battle in one transaction: monster, loot and player hp."""
+    with transaction():
+        mark_monster_defeated(monster_id)
+        if item_id is not None:
+            claim_item(item_id)
+        update_player_hp(player_hp)
 
 # Items
 
 def add_item_to_db(name, description, room_id, is_sword):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
+    _write('''
         INSERT OR IGNORE INTO items (id, name, description, is_sword, room_id, is_claimed) 
         VALUES (NULL, ?, ?, ?, ?, NULL)
         ''', (name, description, is_sword, room_id))
-    conn.commit()
-    conn.close()
+
+def add_items_to_db(items):
+    """Insert (name, description, room_id, is_sword) tuples in one transaction."""
+    with transaction():
+        _write('''
+            INSERT OR IGNORE INTO items (id, name, description, is_sword, room_id, is_claimed) 
+            VALUES (NULL, ?, ?, ?, ?, NULL)
+            ''', [(name, description, is_sword, room_id)
+                  for name, description, room_id, is_sword in items], many=True)
+
+def claim_item(item_id):
+    """Move an item into the player's inventory and mark it claimed."""
+    with transaction():
+        _write("INSERT INTO player_inventory (id, item_id) VALUES (NULL, ?)", (item_id,))
+        _write("UPDATE items SET is_claimed = 1 WHERE id = ?", (item_id,))
 
 def get_random_item():
+    """Pick a random inventory item with two rowid lookups instead of sorting the inventory."""
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("SELECT (SELECT MIN(id) FROM player_inventory), (SELECT MAX(id) FROM player_inventory)")
+    low, high = cursor.fetchone()
+    if low is None:
+        return None  # Return None if the inventory is empty
+    # Inventory rows are never deleted, so ids are dense and a random id is a uniform pick
     cursor.execute(
         """
         SELECT i.id, i.name, i.description 
-        FROM items i 
-        JOIN player_inventory p ON p.item_id = i.id 
-        ORDER BY RANDOM() 
+        FROM player_inventory p 
+        JOIN items i ON i.id = p.item_id 
+        WHERE p.id >= ? 
+        ORDER BY p.id 
         LIMIT 1
-        """
+        """, (random.randint(low, high),)
     )
     item = cursor.fetchone()
-    conn.close()
     if item:
         return dict(item)  # Convert the Row object to a dictionary
     return None  # Return None if no data is found
 
-def initialize_database(num_rooms=25, main_cycle_size=12, num_subcycles=3, subcycle_size_range=(3, 5)):
+# World Metadata
+
+def get_world_meta(key):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT value FROM world_meta WHERE key = ?", (key,))
+    except sqlite3.OperationalError:
+        return None  # Databases from before world_meta existed
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def set_world_meta(key, value):
+    _write("INSERT OR REPLACE INTO world_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+def is_world_populated():
+    """True once monsters and items have been generated for this world."""
+    return get_world_meta("populated") == "1"
+
+def mark_world_populated():
+    set_world_meta("populated", 1)
+
+def is_world_pregenerated():
+    """True once every room has been described up front by pregenerate.py."""
+    return get_world_meta("pregenerated") == "1"
+
+def mark_world_pregenerated():
+    set_world_meta("pregenerated", 1)
+
+def initialize_database(num_rooms=25, main_cycle_size=12, num_subcycles=3, subcycle_size_range=(3, 5), seed=None):
+    """Create the schema and dungeon layout for the current game.
+
+    Returns False straight away when the database already holds a world at the
+    current SCHEMA_VERSION, and True after building (or upgrading) one. The
+    same seed always lays out the same dungeon. Schema changes are writes like
+    any other and go through _write, so the single writer applies them too.
+    """
+    if get_world_meta("schema_version") == str(SCHEMA_VERSION):
+        return False
+
     conn = get_db_connection()
-    conn.execute("PRAGMA journal_mode=WAL;")
     cursor = conn.cursor()
 
+    # Create the world metadata table
+    _write('''
+    CREATE TABLE IF NOT EXISTS world_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    ''')
+
     # Create the rooms table
-    cursor.execute('''
+    _write('''
     CREATE TABLE IF NOT EXISTS rooms (
         id INTEGER PRIMARY KEY,
         name TEXT NOT NULL,
         description TEXT NOT NULL,
-        connections TEXT NOT NULL, -- JSON string of connections
-        visited BOOLEAN DEFAULT 0
+        connections TEXT NOT NULL, -- JSON string of connections, mirrored in room_connections
+        visited BOOLEAN DEFAULT 0,
+        state_version INTEGER NOT NULL DEFAULT 0, -- Bumped when the room's narration goes stale
+        described_version INTEGER -- state_version the description was written for, NULL if never
     )
     ''')
 
-    # Generate 25 rooms with a random layout
-    from generators import generate_dungeon_with_cycles
-    rooms = generate_dungeon_with_cycles(num_rooms, main_cycle_size, num_subcycles, subcycle_size_range)
+    # Databases from schema versions 1 and 2 lack the version columns
+    migrate_room_versions()
 
-    # Insert generated rooms into the database
-    add_rooms_to_db(rooms)
+    # Create the room adjacency table (one row per directed edge)
+    _write('''
+    CREATE TABLE IF NOT EXISTS room_connections (
+        room_id INTEGER NOT NULL,
+        neighbor_id INTEGER NOT NULL,
+        PRIMARY KEY (room_id, neighbor_id),
+        FOREIGN KEY (room_id) REFERENCES rooms (id),
+        FOREIGN KEY (neighbor_id) REFERENCES rooms (id)
+    ) WITHOUT ROWID
+    ''')
+
+    # Databases created before room_connections existed only have the JSON column
+    migrate_room_connections()
+
+    # Generate 25 rooms with a random layout, unless the world already has rooms
+    cursor.execute("SELECT 1 FROM rooms LIMIT 1")
+    if cursor.fetchone() is None:
+        from dungeon_graph import generate_dungeon_csr, csr_to_rooms
+        rooms = csr_to_rooms(*generate_dungeon_csr(num_rooms, main_cycle_size, num_subcycles, subcycle_size_range, seed))
+
+        # Insert generated rooms into the database
+        add_rooms_to_db(rooms)
 
     # Set the first room as the starting room
-    cursor.execute("UPDATE rooms SET description = 'You enter the dungeon.' WHERE id = 1")
+    _write("UPDATE rooms SET description = 'You enter the dungeon.' WHERE id = 1 AND description = ''")
 
     # Create the monsters table
-    cursor.execute('''
+    _write('''
     CREATE TABLE IF NOT EXISTS monsters (
         id INTEGER PRIMARY KEY,
         name TEXT NOT NULL,
@@ -199,7 +872,7 @@ def initialize_database(num_rooms=25, main_cycle_size=12, num_subcycles=3, subcy
     ''')
 
     # Create the items table
-    cursor.execute('''
+    _write('''
         CREATE TABLE IF NOT EXISTS items (
             id INTEGER PRIMARY KEY,
             name TEXT NOT NULL,
@@ -212,7 +885,7 @@ def initialize_database(num_rooms=25, main_cycle_size=12, num_subcycles=3, subcy
     ''')
 
     # Create the player_stats table
-    cursor.execute('''
+    _write('''
     CREATE TABLE IF NOT EXISTS player_stats (
         id INTEGER PRIMARY KEY,
         name TEXT NOT NULL DEFAULT 'Hero',
@@ -225,13 +898,13 @@ def initialize_database(num_rooms=25, main_cycle_size=12, num_subcycles=3, subcy
     # Initialize player stats if not already present
     cursor.execute("SELECT COUNT(*) FROM player_stats")
     if cursor.fetchone()[0] == 0:
-        cursor.execute('''
+        _write('''
         INSERT INTO player_stats (id, name, hp, attack, defense) 
         VALUES (1, 'Hero', 100, 10, 5)
         ''')
 
     # Create the player_inventory table
-    cursor.execute('''
+    _write('''
     CREATE TABLE IF NOT EXISTS player_inventory (
         id INTEGER PRIMARY KEY,
         item_id INTEGER,
@@ -239,5 +912,11 @@ def initialize_database(num_rooms=25, main_cycle_size=12, num_subcycles=3, subcy
     )
     ''')
 
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    # Index the foreign keys used by per-room lookups and inventory joins
+    _write("CREATE INDEX IF NOT EXISTS idx_monsters_room_id ON monsters (room_id)")
+    _write("CREATE INDEX IF NOT EXISTS idx_items_room_id ON items (room_id)")
+    _write("CREATE INDEX IF NOT EXISTS idx_player_inventory_item_id ON player_inventory (item_id)")
+
+    # Record the schema version last, so an interrupted start is redone next time
+    set_world_meta("schema_version", SCHEMA_VERSION)
+    return True
@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+
+# Compact Dungeon Graphs
+#
+# The same main cycle and subcycle layout as generate_dungeon_with_cycles, but
+# built with NumPy into CSR (compressed sparse row) adjacency arrays instead of
+# a dict of sets. The neighbors of room r are indices[indptr[r]:indptr[r + 1]];
+# room ids start at 1, so row 0 is always empty. Memory is two int32 arrays,
+# and generation is a handful of vectorized passes over the rooms and edges,
+# so worlds of 100k rooms take milliseconds.
+
+def _cycle_edges(rooms, starts, ends):
+    """Undirected (u, v) edges closing each rooms[start:end] into a cycle.
+
+    As with sets of neighbors, a cycle of two rooms is one edge and a cycle of
+    one room connects the room to itself.
+    """
+    nxt = np.arange(1, len(rooms) + 1)
+    nxt[ends - 1] = starts  # The last room of each cycle wraps to its first
+    keep = np.ones(len(rooms), dtype=bool)
+    keep[(ends - 1)[ends - starts == 2]] = False
+    return rooms[keep], rooms[nxt[keep]]
+
+def generate_dungeon_csr(num_rooms, main_cycle_size, num_subcycles, subcycle_size_range, seed=None):
+    """Generate a dungeon layout as CSR adjacency arrays (indptr, indices).
+
+    Rooms 1..main_cycle_size form the main cycle. Each subcycle takes a random
+    set of the remaining rooms (its size drawn from subcycle_size_range, fewer
+    if not enough are left), closes them into a cycle and joins one of them to
+    a random main cycle room. Rooms left over have no connections. The same
+    seed always gives the same dungeon.
+    """
+    if main_cycle_size > num_rooms:
+        raise ValueError("Main cycle size cannot exceed total number of rooms.")
+    rng = np.random.default_rng(seed)
+
+    # Main cycle
+    main = np.arange(1, main_cycle_size + 1, dtype=np.int32)
+    u, v = _cycle_edges(main, np.array([0]), np.array([main_cycle_size])) if main_cycle_size else (main, main)
+    edges_u, edges_v = [u], [v]
+
+    # Subcycles take consecutive runs of the shuffled remaining rooms, which is
+    # the same as sampling each one from the rooms not used yet
+    remaining = rng.permutation(np.arange(main_cycle_size + 1, num_rooms + 1, dtype=np.int32))
+    sizes = rng.integers(subcycle_size_range[0], subcycle_size_range[1] + 1, size=num_subcycles)
+    ends = np.minimum(np.cumsum(sizes), len(remaining))
+    starts = np.concatenate(([0], ends[:-1]))
+    used = ends > starts
+    starts, ends = starts[used], ends[used]
+    if len(starts) and main_cycle_size:
+        u, v = _cycle_edges(remaining[:ends[-1]], starts, ends)
+        edges_u.append(u)
+        edges_v.append(v)
+
+        # One link from each subcycle to the main cycle
+        edges_u.append(rng.integers(1, main_cycle_size + 1, size=len(starts)).astype(np.int32))
+        edges_v.append(remaining[starts + rng.integers(0, ends - starts)])
+
+    # Both directions of every edge, except self-loops which are stored once
+    u, v = np.concatenate(edges_u), np.concatenate(edges_v)
+    loops = u == v
+    src = np.concatenate((u, v[~loops]))
+    dst = np.concatenate((v, u[~loops]))
+
+    return csr_from_edges(src, dst, num_rooms)
+
+def csr_from_edges(src, dst, num_rooms):
+    """CSR arrays (indptr, indices) for directed src -> dst edges between rooms 1..num_rooms.
+
+    Edges are bucketed by src with a counting sort, so building takes
+    O(rooms + edges) and each room keeps its edges in input order.
+    """
+    src = np.asarray(src, dtype=np.int32)
+    indptr = np.zeros(num_rooms + 2, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_rooms + 1), out=indptr[1:])
+    indices = np.asarray(dst, dtype=np.int32)[_counting_order(src, num_rooms)]
+    return indptr, indices
+
+def _counting_order(keys, max_key):
+    """Indices that stably sort keys (ints in 0..max_key), by counting rather than comparing.
+
+    An LSD radix sort over 16-bit digits: NumPy's stable sort of 16-bit
+    integers is itself a counting sort, so each pass is linear, and room ids
+    below 65536 need only one pass.
+    """
+    order = np.arange(len(keys), dtype=np.int32)
+    shift = 0
+    while True:
+        digits = ((keys[order] >> shift) & 0xFFFF).astype(np.uint16)
+        order = order[np.argsort(digits, kind="stable")]
+        shift += 16
+        if max_key >> shift == 0:
+            break
+    return order
+
+def csr_neighbors(indptr, indices, room_id):
+    return indices[indptr[room_id]:indptr[room_id + 1]]
+
+def csr_edges(indptr, indices):
+    """Directed (room_id, neighbor_id) arrays, one entry per adjacency."""
+    return np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr)), indices
+
+def csr_to_rooms(indptr, indices):
+    """Room rows for add_rooms_to_db, in the format generate_dungeon_with_cycles returns."""
+    neighbors = np.split(indices, indptr[1:-1])
+    return [(room_id, "", "", json.dumps(neighbors[room_id].tolist()), 0) for room_id in range(1, len(indptr) - 1)]
@@ -1,13 +1,20 @@
-import sqlite3
 import random
 import json
-import streamlit as st
+import queue
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Database Utility Functions
-from db_functions import get_db_connection
-from db_functions import get_room_info, update_room_visited, update_room_name_and_description
-from db_functions import add_monster_to_db, get_monsters_in_room
-from db_functions import add_item_to_db
+from db_functions import get_db_connection, transaction, current_game_id
+from db_functions import initialize_database, is_world_populated, mark_world_populated
+from db_functions import get_room_info, update_room_visited, update_room_name_and_description, mark_room_described
+from db_functions import update_unnamed_room
+from db_functions import add_monsters_to_db, get_monsters_in_room, get_neighbor_rooms
+from db_functions import get_all_room_connections, load_room_context
+from db_functions import add_items_to_db
 
 # Pydantic Models
 from pydantic_types import DungeonRoomInfo
@@ -15,7 +22,24 @@ from pydantic_types import MonstersInfo
 from pydantic_types import ItemsInfo
 
 # AI Utility Functions
-from ai_functions import chat_prompt, chat_prompt_json, get_client
+from ai_functions import chat_prompt, chat_prompt_json
+from prompts import room_prompt, ROOM_SYSTEM_PROMPT
+from ai_functions import chat_prompt_stream, chat_prompt_json_stream
+from llm_resilience import LLMUnavailable
+
+# Background Prefetching
+from prefetch import room_prefetcher, run_for_game
+from singleflight import SingleFlight
+
+# Entity Placement
+from placement import sample_rooms, room_depths, depth_weights
+from dungeon_graph import csr_from_edges
+
+# Room Description Cache
+from room_cache import room_descriptions
+
+# Offline Template Descriptions
+from room_templates import template_room
 
 def generate_dungeon_with_cycles(num_rooms, main_cycle_size, num_subcycles, subcycle_size_range):
     """
@@ -75,14 +99,14 @@ def generate_dungeon_with_cycles(num_rooms, main_cycle_size, num_subcycles, subc
     
     return rooms
 
-def generate_monsters():
+def count_rooms():
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM rooms")
-    num_rooms = cursor.fetchone()[0]
-    conn.commit()
-    conn.close()
+    return cursor.fetchone()[0]
 
+def request_monsters(num_rooms):
+    """Ask the LLM for a list of monsters for a dungeon of num_rooms rooms."""
     prompt_text = f"""
     You are a dungeon master generating a list of monsters for a immersive text adventure game.
     The game is called Shadows of Mythlandia, and follows a hero delving deep into the mysterious vaults of an ancient mountain riddles with caverns, dwarven fortresses, forgotten tombs, tunnels, and the like.
@@ -96,26 +120,45 @@ def generate_monsters():
     
     system_prompt = "You are a dungeon master generating a list of monsters for a immersive text adventure game."
     
-    monster_list = chat_prompt_json(prompt_text,system_prompt,1000,MonstersInfo)
-
-    # Assign monsters to rooms
-    available_rooms = set(range(2, num_rooms + 1))
-    for monster in monster_list.monsters:
-        # Randomly select a room, and remove it from the available rooms
-        room_id = random.choice(list(available_rooms))
-        available_rooms.discard(room_id)
-        # Limit hp and attack to a maximum of 100 and 10
-        full_hp = min(monster.hp, 100)
-        attack = min(monster.attack, 10)
-        # Insert the monster into the database
-        add_monster_to_db(monster.name, monster.description, room_id, full_hp, attack)
+    # Every new world should get fresh monsters, so skip the response cache
+    return chat_prompt_json(prompt_text,system_prompt,1000,MonstersInfo,cache=False,caller="monsters")
 
-def generate_items():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM rooms")
-    num_rooms = cursor.fetchone()[0]
+def place_monsters(monster_list, num_rooms, weights=None):
+    """Put each monster in its own room, never the entrance.
+
+    weights, indexed by room id (see placement.depth_weights), bias the draw.
+    Monsters beyond the number of free rooms are left out.
+    """
+    room_ids = entity_rooms(len(monster_list.monsters), num_rooms, weights)
+    # Limit hp and attack to a maximum of 100 and 10
+    monsters = [(monster.name, monster.description, room_id, min(monster.hp, 100), min(monster.attack, 10))
+                for monster, room_id in zip(monster_list.monsters, room_ids)]
+
+    # Insert all monsters into the database at once
+    add_monsters_to_db(monsters)
+
+def room_depth_weights(bias=1.0):
+    """Placement weights for the current game's rooms by distance from the entrance.
+
+    A positive bias puts monsters and items deeper in the dungeon, a negative
+    one nearer the entrance.
+    """
+    connections = get_all_room_connections()
+    src = [room_id for room_id, neighbor_ids in connections.items() for _ in neighbor_ids]
+    dst = [neighbor_id for neighbor_ids in connections.values() for neighbor_id in neighbor_ids]
+    return depth_weights(room_depths(*csr_from_edges(src, dst, count_rooms())), bias)
+
+def entity_rooms(count, num_rooms, weights=None):
+    """Draw count distinct rooms from 2..num_rooms in one go, as plain ints for SQLite."""
+    room_ids = np.arange(2, num_rooms + 1)
+    return sample_rooms(room_ids, count, None if weights is None else weights[room_ids]).tolist()
+
+def generate_monsters():
+    num_rooms = count_rooms()
+    place_monsters(request_monsters(num_rooms), num_rooms)
 
+def request_items(num_rooms):
+    """Ask the LLM for a list of items for a dungeon of num_rooms rooms."""
     prompt_text = f"""
     You are a dungeon master generating a list of items and treasures for an immersive text adventure game.
     The game is called Shadows of Mythlandia, and follows a hero delving deep into the mysterious vaults of an ancient mountain riddles with caverns, dwarven fortresses, forgotten tombs, tunnels, and the like.
@@ -125,172 +168,382 @@ def generate_items():
     The output should be in JSON format.
     """
     
-    prompt = {
-        "model": "gpt-4o-mini",
-        "messages": [
-            {
-            "role": "system",
-                "content": "You are a dungeon master generating a list of items for a immersive text adventure game.",
-            },
-            {
-                "role": "user",
-                "content": prompt_text[0],
-            },
-        ],
-        "max_tokens": 1000
-    }
-
-    client = get_client()
-
-    # Call OpenAI to generate items
-    completion = client.beta.chat.completions.parse(**prompt, response_format=ItemsInfo)
-    item_list = completion.choices[0].message.parsed
-
-    # Assign items to rooms
-    available_rooms = set(range(2, num_rooms + 1))
-    for idx, item in enumerate(item_list.items):
-        # Randomly select a room, and remove it from the available rooms
-        room_id = random.choice(list(available_rooms))
-        available_rooms.discard(room_id)
-        # Insert the item into the database
-        add_item_to_db(item.name, item.description, room_id, item.is_sword)
-        
-    conn.commit()
-    conn.close()
+    system_prompt = "You are a dungeon master generating a list of items for a immersive text adventure game."
 
-@st.cache_data
-def generate_room_details(room_id, neighbor_ids, visited, current_room_monsters, monsters):
-    """Generate room names and descriptions using OpenAI JSON mode."""
-    # Connect to the database
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # Every new world should get fresh items, so skip the response cache
+    return chat_prompt_json(prompt_text, system_prompt, 1000, ItemsInfo, cache=False, model="gpt-4o-mini", caller="items")
 
-    # Query current room and neighboring room details
-    cursor.execute("SELECT id, name, description FROM rooms WHERE id = ?", (room_id,))
-    current_room_data = cursor.fetchone()
+def place_items(item_list, num_rooms, weights=None):
+    """Put each item in its own room, like place_monsters."""
+    room_ids = entity_rooms(len(item_list.items), num_rooms, weights)
+    items = [(item.name, item.description, room_id, item.is_sword) for item, room_id in zip(item_list.items, room_ids)]
 
-    cursor.execute("SELECT id, name, description FROM rooms WHERE id IN ({})".format(
-        ",".join("?" * len(neighbor_ids))), neighbor_ids)
-    neighbors = cursor.fetchall()
+    # Insert all items into the database at once
+    add_items_to_db(items)
 
-    # Query monsters in the current room
-    cursor.execute("SELECT name, description, hp, defeated, attack, description FROM monsters WHERE room_id = ?", (room_id,))
-    current_room_monsters = cursor.fetchall()
+def generate_items():
+    num_rooms = count_rooms()
+    place_items(request_items(num_rooms), num_rooms)
+
+def populate_world(num_rooms=25, main_cycle_size=12, num_subcycles=3, subcycle_size_range=(3, 5), seed=None,
+                   depth_bias=None):
+    """Create and populate the current game's world.
+
+    The monster and item LLM calls don't depend on each other or on the room
+    graph, so they run on worker threads while the database and dungeon are
+    built. A new world then costs about the slowest call instead of the sum.
+    Returns False if the world was already populated. seed fixes the dungeon
+    layout, not the LLM's monsters and items. With depth_bias, monsters and
+    items are placed by distance from the entrance (see room_depth_weights);
+    without it every room is equally likely.
+    """
+    if is_world_populated():
+        initialize_database(num_rooms, main_cycle_size, num_subcycles, subcycle_size_range, seed)
+        return False
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="populate") as pool:
+        monsters_future = pool.submit(request_monsters, num_rooms)
+        items_future = pool.submit(request_items, num_rooms)
+
+        initialize_database(num_rooms, main_cycle_size, num_subcycles, subcycle_size_range, seed)
+        num_rooms = count_rooms()  # An existing room graph may differ from the requested size
+
+        # The database work stays on this thread, which owns the game's connection
+        weights = None if depth_bias is None else room_depth_weights(depth_bias)
+        with transaction():
+            place_monsters(monsters_future.result(), num_rooms, weights)
+            place_items(items_future.result(), num_rooms, weights)
+            mark_world_populated()
+    return True
+
+def describe_room(context):
+    """Generate room names and descriptions using OpenAI JSON mode."""
+    prompt_text, system_prompt, neighbors_for_ai = build_room_prompt(context)
 
-    # Query monster states
-    alive_monsters = [m for m in current_room_monsters if not m[3]]  # 'defeated' is at index 3 in the tuple
-    defeated_monsters = [m for m in current_room_monsters if m[3]]  # 'defeated' is at index 3 in the tuple
+    details = chat_prompt_json(prompt_text, system_prompt, 500, DungeonRoomInfo, caller="room")
+    print('Chat response:', details)
+
+    store_room_details(context, details, neighbors_for_ai)
 
-    # Query monsters in neighboring rooms
-    neighbor_monsters = []
-    for neighbor_id in neighbor_ids:
-        cursor.execute("SELECT name, description, hp, defeated, attack, description FROM monsters WHERE room_id = ?", (neighbor_id,))
-        neighbor_monsters.extend(cursor.fetchall())
+def build_room_prompt(context):
+    """Return (prompt_text, system_prompt, neighbors_for_ai) for describing the room in a RoomContext."""
+    neighbors = [neighbor.model_dump() for neighbor in context.neighbors]
 
-    # Format current room and neighbors for the AI prompt
+    # Unnamed neighbors are the ones the LLM may name
     neighbors_for_ai = [
-        {"id": r[0], "name": r[1] if r[1] else "Unknown", "description": r[2] if r[2] else "Undescribed"}
+        {"id": r['id'], "name": r['name'] if r['name'] else "Unknown", "description": r['description'] if r['description'] else "Undescribed"}
         for r in neighbors
     ]
     print('Neighbors for AI:', neighbors_for_ai)
 
-    # Format monsters for the AI prompt
-    alive_monsters_for_ai = [
-        {"name": r[0], "description": r[1], "hp": r[2], "defeated": r[3], "attack": r[4], "description": r[5]}
-        for r in alive_monsters
-    ]
-    defeated_monsters_for_ai = [
-        {"name": r[0], "description": r[1], "hp": r[2], "defeated": r[3], "attack": r[4], "description": r[5]}
-        for r in defeated_monsters
-    ]
-    neighbor_monsters_for_ai = [
-        {"name": r[0], "description": r[1], "hp": r[2], "defeated": r[3], "attack": r[4], "description": r[5]}
-        for r in neighbor_monsters
-    ]
-
-    prompt_text = (
-        f"Current room: ID: {current_room_data[0]}, Name: {current_room_data[1] or 'Unknown'}, "
-        f"visited: {visited}\n"
-        f"Description: {current_room_data[2] or 'Undescribed'}\n\n"
-        f"Alive monsters in current room:\n{json.dumps(alive_monsters_for_ai, indent=4)}\n\n"
-        f"Defeated monsters in current room:\n{json.dumps(defeated_monsters_for_ai, indent=4)}\n\n"
-        f"Neighboring room information:\n{json.dumps(neighbors_for_ai, indent=4)}\n\n"
-        f"Monsters in neighboring rooms:\n{json.dumps(neighbor_monsters_for_ai, indent=4)}\n\n"
-        f"Provide a short but immersive room description considering these details. Don't change the room in the Neighboring room information.\n"
-        "Provide output in JSON format:\n"
-        "{'current_room': {'id': '', 'name': '', 'description': ''}, "
-        "'neighbors': [{'id': '', 'name': '', 'description': ''}, ...], "\
-    )
-
-    system_prompt = (
-        "You are a dungeon master generating immersive room details for a text adventure game. "
-        "Given the current room, its neighbors, and the monsters within, "
-        "provide names and descriptions for each room. Make sure to take into account if the player already defeated the monsters or not."
-        "Descriptions should hint at interconnections and an overarching story."
-        "The game is called Shadows of Mythlandia, and follows a hero delving deep into the "
-        "mysterious vaults of an ancient mountain riddles with caverns, dwarven fortresses,"
-        "forgotten tombs, tunnels, and the like."
-        "The room descriptions should be palpable and vivid, as if you were there yourself."
-        "To make the game more atmospheric and immersive, room descriptions should use information"
-        "from the surrounding rooms and the monsters within them to create a sense of surroundings."
-        "When there is a monster present, make sure to focus the description on the monster, and make it clear that it's there."
-        "Remember that not every room has to be an iconic location, sometimes there are just passageways or tunnels."
-        "Make sure to replace any Unknown or Undescribed rooms with real names and descriptions."
-        "Keep responses to 500 characters or less"
-        "Please do not change any room ids, just replace the room names and descriptions."
-        "Do not generate more neighbors than exist in the Neighboring room information"
-    )
-
-    print('Prompt text:', prompt_text)
-
-    details = chat_prompt_json(prompt_text, system_prompt, 500, DungeonRoomInfo)
-    print('Chat response:', details)
-
-    # Update the database with the new room details
-    update_room_name_and_description(details.current_room.id, details.current_room.name, details.current_room.description)
-
-    for idx, neighbor in enumerate(details.neighbors):
-        if neighbors_for_ai[idx]['name'] == 'Unknown':
-            update_room_name_and_description(neighbors_for_ai[idx]['id'], neighbor.name, neighbor.description)
-
-    conn.commit()
-    conn.close()
+    # Compact prompt, trimmed to the token budget
+    prompt_text, tokens, level = room_prompt(
+        context.room.model_dump(), context.room.visited,
+        [monster.model_dump() for monster in context.room_monsters], neighbors,
+        [monster.model_dump() for monster in context.neighbor_monsters])
+    print(f'Prompt text ({tokens} tokens, detail level {level}):', prompt_text)
+
+    return prompt_text, ROOM_SYSTEM_PROMPT, neighbors_for_ai
+
+def save_room_details(details, neighbors_for_ai):
+    """Store generated names and descriptions, keeping already named neighbors."""
+    # Update the database with the new room details in a single commit
+    with transaction():
+        update_room_name_and_description(details.current_room.id, details.current_room.name, details.current_room.description)
+
+        for idx, neighbor in enumerate(details.neighbors):
+            if neighbors_for_ai[idx]['name'] == 'Unknown':
+                update_unnamed_room(neighbors_for_ai[idx]['id'], neighbor.name, neighbor.description)
+
+def store_room_details(context, details, neighbors_for_ai):
+    """Save generated details and record the room's text as written for the state it was generated from."""
+    with transaction():
+        save_room_details(details, neighbors_for_ai)
+        mark_room_described(context.room.id, context.room.state_version)
+    room_descriptions.put(room_state_key(context), room_text(details.current_room.model_dump()))
+
+def get_room_description(room_id, deadline=None):
+    """Describe room_id and return its text.
+
+    With a deadline (seconds), return a template description if the LLM
+    hasn't finished by then; see describe_room_with_deadline.
+    """
+    if deadline is not None:
+        for text in describe_room_with_deadline(room_id, deadline):
+            pass
+        return text
+
+    # The room, its neighbors and the monsters in all of them
+    context = load_room_context(room_id)
+
+    # A room already described in its current state is a lookup
+    key = room_state_key(context)
+    text = room_descriptions.get(key)
+
+    # Generate names and descriptions for the current room and neighbors - save to database,
+    # unless pregenerate.py or a background prefetch has already done it
+    if text is None and not _described(context) and not _wait_for_prefetch(room_id):
+        try:
+            room_flights.do(key, lambda: describe_room(context))
+        except LLMUnavailable as exc:
+            print('LLM unavailable, showing the room as stored:', exc)
+    
+    # Set visited status for the current room
+    update_room_visited(room_id, True)
 
-def get_room_description(room_id):
+    # Get updated room description
+    return text or room_text(get_room_info(room_id))
 
-    # Get current room's visited status and connections
-    room_data = get_room_info(room_id)
+def _described(context):
+    """True if the stored description was written for the room's current state.
 
-    # Get the ids of neighboring rooms
-    neighbor_ids = json.loads(room_data['connections'])
+    This is the lasting form of the room_cache check: it survives restarts
+    and cache evictions, so such a revisit never calls the LLM again. Rooms
+    described up front by pregenerate.py count too, until their state changes.
+    """
+    return bool(context.room.description) and context.room.described_version == context.room.state_version
 
-    # Query monsters in the current room
-    current_room_monsters = get_monsters_in_room(room_id)
+# Concurrent requests to describe the same room in the same state share one LLM call.
+# Keys are scoped to a game, and every session plays its own game, so what
+# coalesces is the background prefetch with the player walking in, and tabs
+# resuming the same game, not different sessions.
+room_flights = SingleFlight()
 
-    # Query monsters in neighboring rooms
-    neighbor_monsters = []
-    for neighbor_id in neighbor_ids:
-        neighbor_monsters.extend(get_monsters_in_room(neighbor_id))
+def room_state_key(context):
+    """Identify a room description by game, room and the room's state version (see room_cache).
 
-    # Concatenate current room monsters and neighbor monsters
-    all_monsters = current_room_monsters + neighbor_monsters
+    The game is part of the key on purpose: room ids and state versions are
+    per game database, so the same key in two games is a different room.
+    """
+    return (current_game_id(), context.room.id, context.room.state_version)
+
+# Degraded mode text, shown while the LLM is unavailable
+DARK_ROOM_NAME = "A Dark Passage"
+DARK_ROOM_DESCRIPTION = "It is too dark to make out much here. Passages lead off into the shadows."
+
+def room_text(room_data):
+    """Build the text shown for a room: a ---name--- header and its description."""
+    name = room_data['name'] or DARK_ROOM_NAME
+    description = room_data['description'] or DARK_ROOM_DESCRIPTION
+    return f"---{name}---\n{description}"
+
+def stream_room_description(room_id):
+    """Like get_room_description, but yields the text in pieces as it is written."""
+    context = load_room_context(room_id)
+    flight_key = room_state_key(context)
+    text = room_descriptions.get(flight_key)
+
+    shown = False
+    try:
+        if text is not None or _described(context):
+            pass  # Nothing to generate; the stored text is shown below
+        elif not _wait_for_prefetch(room_id):
+            # Another session already describing this room is waited on, then its text is shown
+            with room_flights.lead(flight_key) as leading:
+                if leading:
+                    prompt_text, system_prompt, neighbors_for_ai = build_room_prompt(context)
+                    chunks = _stream_room_text(chat_prompt_json_stream(prompt_text, system_prompt, 500, DungeonRoomInfo, caller="room"))
+                    try:
+                        while True:
+                            yield next(chunks)
+                            shown = True
+                    except StopIteration as stop:
+                        print('Chat response:', stop.value)
+                        store_room_details(context, stop.value, neighbors_for_ai)
+    except LLMUnavailable as exc:
+        # Text already shown stays as it is; otherwise fall through to the stored room
+        print('LLM unavailable, showing the room as stored:', exc)
 
-    # Generate names and descriptions for the current room and neighbors - save to database
-    generate_room_details(room_id, neighbor_ids, room_data['visited'], current_room_monsters, all_monsters)
-    
-    # Set visited status for the current room
     update_room_visited(room_id, True)
 
-    # Get updated room description
-    room_data = get_room_info(room_id)
+    if not shown:
+        yield text or room_text(get_room_info(room_id))
 
-    # Build text for the room description
-    text = f"---{room_data['name']}---\n{room_data['description']}"
+def _stream_room_text(partials):
+    """Turn partial DungeonRoomInfo dicts into "---name---" and description text deltas.
 
-    return text
+    Returns the final DungeonRoomInfo once the stream is complete.
+    """
+    written = None
+    while True:
+        try:
+            partial = next(partials)
+        except StopIteration as stop:
+            details = stop.value
+            break
+        room = partial.get('current_room', {})
+        # The name is complete once the description has started
+        if 'description' not in room:
+            continue
+        if written is None:
+            yield f"---{room['name']}---\n"
+            written = 0
+        if len(room['description']) > written:
+            yield room['description'][written:]
+            written = len(room['description'])
+
+    if written is None:
+        yield f"---{details.current_room.name}---\n{details.current_room.description}"
+    return details
+
+# Deadline Hedging
+#
+# A move never waits on the LLM for more than the deadline. The description is
+# written on a worker thread and streamed from there; if it isn't finished in
+# time, a template from the Procedural engine is shown instead (or the text so
+# far, if some arrived) and the real description is picked up once it lands.
+
+DESCRIPTION_DEADLINE = 4.0  # Seconds
+_describe_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="describe")
+MAX_LATE_DESCRIPTIONS = 256  # Oldest entries past this are dropped, e.g. those of abandoned games
+_late_descriptions = OrderedDict()  # (game_id, room_id) -> Future of the full room text, oldest first
+_late_lock = threading.Lock()
+
+def describe_room_with_deadline(room_id, deadline=None):
+    """Yield the room text so far (whole text, not deltas) as it is written, for at most deadline seconds.
+
+    If the deadline passes first, the last text yielded is a stand-in and
+    late_description_ready(game_id, room_id) turns True once the real one is stored.
+    """
+    game_id = current_game_id()
+    deadline = DESCRIPTION_DEADLINE if deadline is None else deadline
+
+    # A description that missed the previous deadline is shown once it has landed
+    late = _take_late_description(game_id, room_id)
+    if late is not None:
+        yield late
+        return
+
+    chunks = queue.Queue()
+    def generate():
+        text = ""
+        for chunk in stream_room_description(room_id):
+            text += chunk
+            chunks.put(chunk)
+        return text
+    future = _describe_pool.submit(run_for_game, game_id, generate)
+    future.add_done_callback(lambda _: chunks.put(None))
+
+    end = time.monotonic() + deadline
+    text = ""
+    while True:
+        try:
+            chunk = chunks.get(timeout=max(0.0, end - time.monotonic()))
+        except queue.Empty:
+            break
+        if chunk is None:
+            future.result()  # Re-raise anything the LLM fallbacks didn't handle
+            return
+        text += chunk
+        yield text
+
+    with _late_lock:
+        for key in [key for key, late in _late_descriptions.items() if key[0] == game_id and late.done()]:
+            del _late_descriptions[key]
+        _late_descriptions[(game_id, room_id)] = future
+        _late_descriptions.move_to_end((game_id, room_id))
+        while len(_late_descriptions) > MAX_LATE_DESCRIPTIONS:
+            _late_descriptions.popitem(last=False)
+    if text:
+        yield text + " ..."
+    else:
+        name, description = template_room(room_id, get_monsters_in_room(room_id))
+        yield f"---{name}---\n{description}"
+
+def late_description_pending(game_id, room_id):
+    """True while a description that missed its deadline is still being written."""
+    with _late_lock:
+        future = _late_descriptions.get((game_id, room_id))
+    return future is not None and not future.done()
+
+def late_description_ready(game_id, room_id):
+    """True once a description that missed its deadline has been stored.
+
+    Takes game_id explicitly: a timed fragment rerun runs on a fresh script
+    thread, where use_game hasn't been called.
+    """
+    with _late_lock:
+        future = _late_descriptions.get((game_id, room_id))
+    return future is not None and future.done()
+
+def _take_late_description(game_id, room_id):
+    with _late_lock:
+        future = _late_descriptions.get((game_id, room_id))
+        if future is None or not future.done():
+            return None
+        del _late_descriptions[(game_id, room_id)]
+    try:
+        return future.result()
+    except Exception as exc:
+        print('Late room description failed:', exc)
+        return None
+
+def _prefetch_room(room_id):
+    """Describe an unvisited room as if the player had just walked in."""
+    context = load_room_context(room_id)
+    if (context is None or context.room.visited or _described(context)
+            or room_descriptions.get(room_state_key(context)) is not None):
+        return
+    room_flights.do(room_state_key(context), lambda: describe_room(context))
+
+def prefetch_neighbor_descriptions(room_id):
+    """Start generating descriptions for the unvisited neighbors of room_id.
+
+    Rooms whose stored text still fits their state, such as those described by
+    pregenerate.py, are skipped by _prefetch_room.
+    """
+    unvisited = [neighbor['id'] for neighbor in get_neighbor_rooms(room_id) if not neighbor['visited']]
+    room_prefetcher.prefetch(current_game_id(), unvisited, _prefetch_room)
+
+def _wait_for_prefetch(room_id):
+    """True if room_id was described in the background (waiting if still in flight)."""
+    future = room_prefetcher.take(current_game_id(), room_id)
+    if future is None or future.cancel():
+        return False
+    try:
+        future.result()
+    except Exception as exc:
+        print('Prefetch failed, generating in the foreground:', exc)
+        return False
+    return True
 
 def generate_battle_descriptions(room_id, battle_stats, monster_name, item):
-
+    prompt_text, system_prompt = build_battle_prompt(room_id, battle_stats, monster_name, item)
+
+    try:
+        battle_desc = chat_prompt(prompt_text, system_prompt, 200, caller="battle")
+    except LLMUnavailable as exc:
+        print('LLM unavailable, using a plain battle description:', exc)
+        battle_desc = plain_battle_text(battle_stats, monster_name)
+
+    return battle_desc
+
+def stream_battle_description(room_id, battle_stats, monster_name, item):
+    """Like generate_battle_descriptions, but yields the text in pieces as it is written."""
+    prompt_text, system_prompt = build_battle_prompt(room_id, battle_stats, monster_name, item)
+
+    shown = False
+    try:
+        for chunk in chat_prompt_stream(prompt_text, system_prompt, 200, caller="battle"):
+            yield chunk
+            shown = True
+    except LLMUnavailable as exc:
+        print('LLM unavailable, using a plain battle description:', exc)
+        if not shown:
+            yield plain_battle_text(battle_stats, monster_name)
+
+def plain_battle_text(battle_stats, monster_name):
+    """Degraded mode battle description, built from the stats alone."""
+    if battle_stats.player_defeated:
+        return f"The {monster_name} strikes you down."
+    if battle_stats.monster_defeated:
+        return f"Your blow lands true and the {monster_name} falls."
+    if battle_stats.player_damage == 0:
+        return f"You swing at the {monster_name}, but it turns your blow aside and strikes back."
+    return f"You trade blows with the {monster_name}."
+
+def build_battle_prompt(room_id, battle_stats, monster_name, item):
+    """Return (prompt_text, system_prompt) for narrating one exchange of blows."""
     # Fetch room name and description for the given room_id
     room_data = get_room_info(room_id)
 
@@ -337,7 +590,5 @@ def generate_battle_descriptions(room_id, battle_stats, monster_name, item):
         )
 
     system_prompt = "You are a dungeon master describing a battle in an immersive text adventure game.  The user will supply the details of the situation, your job is to describe the action given the information."
-    
-    battle_desc = chat_prompt(prompt_text, system_prompt, 200)
 
-    return battle_desc
\ No newline at end of file
+    return prompt_text, system_prompt
\ No newline at end of file
@@ -0,0 +1,121 @@
+import sqlite3
+import threading
+import hashlib
+import json
+import time
+
+# Persistent LLM Response Cache
+#
+# Responses are stored in their own SQLite file, keyed by a hash of the full
+# request (model, messages, max_tokens and response schema), so identical
+# prompts are answered locally across restarts and across server processes.
+
+LLM_CACHE = {
+    "enabled": True,
+    "path": "llm_cache.db",
+    "ttl": 30 * 24 * 3600,  # Seconds before an entry expires, None to keep forever
+    "max_bytes": 50 * 1024 * 1024,  # Least recently used entries are evicted past this size
+    "prune_every": 100,  # Puts between checks for expired entries and the size limit
+}
+
+_local = threading.local()
+_puts = 0  # Puts by this process, to space out pruning
+_puts_lock = threading.Lock()
+
+def configure_llm_cache(**settings):
+    """Override any of the LLM_CACHE settings (enabled, path, ttl, max_bytes, prune_every)."""
+    unknown = set(settings) - set(LLM_CACHE)
+    if unknown:
+        raise ValueError(f"Unknown LLM cache settings: {sorted(unknown)}")
+    LLM_CACHE.update(settings)
+
+def _get_connection():
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    path = LLM_CACHE["path"]
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache (created_at)")
+        conn.commit()
+        connections[path] = conn
+    return conn
+
+def cache_key(request, schema=None):
+    """Content hash of an LLM request dict plus the response schema, if any."""
+    payload = json.dumps({"request": request, "schema": schema}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_cached_response(key):
+    """Return the cached response text for key, or None on a miss."""
+    if not LLM_CACHE["enabled"]:
+        return None
+    conn = _get_connection()
+    row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    response, created_at = row
+    now = time.time()
+    if LLM_CACHE["ttl"] is not None and now - created_at > LLM_CACHE["ttl"]:
+        conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        conn.commit()
+        return None
+    conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+    conn.commit()
+    return response
+
+def put_cached_response(key, response):
+    """Store a response, pruning expired and least recently used entries every prune_every puts.
+
+    Summing the sizes reads every row, so the cache may run over max_bytes by
+    up to prune_every responses between checks. Expired entries are never
+    served in the meantime, as get_cached_response checks their age.
+    """
+    global _puts
+    if not LLM_CACHE["enabled"]:
+        return
+    with _puts_lock:
+        prune = _puts % LLM_CACHE["prune_every"] == 0
+        _puts += 1
+    conn = _get_connection()
+    now = time.time()
+    size = len(response.encode("utf-8"))
+    conn.execute('''
+        INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, last_used)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (key, response, size, now, now))
+    if prune:
+        if LLM_CACHE["ttl"] is not None:
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - LLM_CACHE["ttl"],))
+        _evict_to_size(conn, LLM_CACHE["max_bytes"])
+    conn.commit()
+
+def _evict_to_size(conn, max_bytes):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+    if total <= max_bytes:
+        return
+    evicted = []
+    for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used"):
+        if total <= max_bytes:
+            break
+        evicted.append((key,))
+        total -= size
+    conn.executemany("DELETE FROM llm_cache WHERE key = ?", evicted)
+
+def clear_llm_cache():
+    conn = _get_connection()
+    conn.execute("DELETE FROM llm_cache")
+    conn.commit()
@@ -0,0 +1,176 @@
+import csv
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from prompts import count_tokens
+
+# LLM Call Metrics
+#
+# Every chat_prompt* call is recorded here: which generator made it (caller),
+# the model, whether the response cache answered it, wall time, time to first
+# token for streams, and prompt and completion tokens. Token counts are the
+# provider's usage where the backend reports it (see report_usage) and
+# estimates from prompts.count_tokens otherwise; cache hits cost no tokens.
+#
+# Samples are kept in memory for summaries (summarize, format_summary) and can
+# be written out with export_metrics, or appended as they happen to a JSON
+# lines file by setting log_path.
+
+LLM_METRICS = {
+    "enabled": True,
+    "max_samples": 10000,  # Oldest samples are dropped past this many
+    "log_path": None,  # JSON lines file every sample is appended to, if set
+}
+
+FIELDS = ["time", "caller", "model", "stream", "cache", "wall_ms", "ttft_ms",
+          "prompt_tokens", "completion_tokens", "tokens_reported", "error"]
+
+_samples = deque(maxlen=LLM_METRICS["max_samples"])
+_samples_lock = threading.Lock()
+_local = threading.local()
+
+def configure_llm_metrics(**settings):
+    """Override any of the LLM_METRICS settings (enabled, max_samples, log_path)."""
+    global _samples
+    unknown = set(settings) - set(LLM_METRICS)
+    if unknown:
+        raise ValueError(f"Unknown LLM metrics settings: {sorted(unknown)}")
+    LLM_METRICS.update(settings)
+    with _samples_lock:
+        _samples = deque(_samples, maxlen=LLM_METRICS["max_samples"])
+
+def reset_llm_metrics():
+    with _samples_lock:
+        _samples.clear()
+
+# Recording
+
+class LLMCall:
+    """Measurements for one call, filled in while it runs."""
+
+    def __init__(self, request, caller, cache, stream):
+        self.started = time.perf_counter()
+        self.sample = {
+            "time": time.time(), "caller": caller, "model": request["model"], "stream": stream,
+            "cache": "miss" if cache else "off", "wall_ms": None, "ttft_ms": None,
+            "prompt_tokens": sum(count_tokens(message["content"]) for message in request["messages"]),
+            "completion_tokens": 0, "tokens_reported": False, "error": None,
+        }
+
+    def first_token(self):
+        if self.sample["ttft_ms"] is None:
+            self.sample["ttft_ms"] = (time.perf_counter() - self.started) * 1000
+
+    def cache_hit(self):
+        self.sample.update(cache="hit", prompt_tokens=0)
+
+    def completion(self, text):
+        """Estimate completion tokens from the response text, unless the backend reported them."""
+        if not self.sample["tokens_reported"]:
+            self.sample["completion_tokens"] = count_tokens(text)
+
+@contextmanager
+def track_llm_call(request, caller, cache, stream=False):
+    """Record the LLM call made inside the block; yields its LLMCall.
+
+    Exceptions are recorded by type name and re-raised. A stream closed
+    before it finished is recorded as "abandoned".
+    """
+    call = LLMCall(request, caller, cache, stream)
+    previous = getattr(_local, "call", None)
+    _local.call = call
+    try:
+        yield call
+    except GeneratorExit:
+        call.sample["error"] = "abandoned"
+        raise
+    except BaseException as exc:
+        call.sample["error"] = type(exc).__name__
+        raise
+    finally:
+        _local.call = previous
+        call.sample["wall_ms"] = (time.perf_counter() - call.started) * 1000
+        _record(call.sample)
+
+def report_usage(prompt_tokens, completion_tokens):
+    """Called by backends with the provider's token usage for the call in progress on this thread."""
+    call = getattr(_local, "call", None)
+    if call is not None:
+        call.sample.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, tokens_reported=True)
+
+def _record(sample):
+    if not LLM_METRICS["enabled"]:
+        return
+    with _samples_lock:
+        _samples.append(sample)
+        if LLM_METRICS["log_path"]:
+            with open(LLM_METRICS["log_path"], "a") as f:
+                f.write(json.dumps(sample) + "\n")
+
+# Summaries
+
+def get_llm_samples():
+    with _samples_lock:
+        return list(_samples)
+
+def percentile(values, p):
+    """Nearest-rank percentile of values, or None if there are none."""
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def summarize(group_by="caller"):
+    """Return {group: stats} over the recorded calls, grouped by a sample field.
+
+    Latency percentiles are in milliseconds; time to first token only covers
+    streamed calls that were answered by the LLM.
+    """
+    groups = {}
+    for sample in get_llm_samples():
+        groups.setdefault(sample[group_by], []).append(sample)
+
+    summary = {}
+    for group, samples in sorted(groups.items(), key=lambda item: str(item[0])):
+        wall = [sample["wall_ms"] for sample in samples]
+        ttft = [sample["ttft_ms"] for sample in samples if sample["cache"] != "hit"]
+        summary[group] = {
+            "calls": len(samples),
+            "errors": sum(1 for sample in samples if sample["error"]),
+            "cache_hits": sum(1 for sample in samples if sample["cache"] == "hit"),
+            **{f"wall_p{p}": percentile(wall, p) for p in (50, 95, 99)},
+            **{f"ttft_p{p}": percentile(ttft, p) for p in (50, 95, 99)},
+            "prompt_tokens": sum(sample["prompt_tokens"] for sample in samples),
+            "completion_tokens": sum(sample["completion_tokens"] for sample in samples),
+        }
+    return summary
+
+def format_summary(group_by="caller"):
+    """summarize() as a text table."""
+    def ms(value):
+        return f"{value:8.0f}" if value is not None else f"{'-':>8}"
+
+    lines = [f"{group_by:<10} {'calls':>6} {'errors':>6} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+             f"{'ttft p50':>8} {'ttft p95':>8} {'prompt tk':>10} {'compl tk':>9}"]
+    for group, stats in summarize(group_by).items():
+        lines.append(f"{str(group):<10} {stats['calls']:6d} {stats['errors']:6d} {stats['cache_hits']:5d} "
+                     f"{ms(stats['wall_p50'])} {ms(stats['wall_p95'])} {ms(stats['wall_p99'])} "
+                     f"{ms(stats['ttft_p50'])} {ms(stats['ttft_p95'])} "
+                     f"{stats['prompt_tokens']:10d} {stats['completion_tokens']:9d}")
+    return "\n".join(lines)
+
+def export_metrics(path):
+    """Write the recorded samples to path, as CSV if it ends in .csv and JSON lines otherwise."""
+    samples = get_llm_samples()
+    with open(path, "w", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(samples)
+        else:
+            f.writelines(json.dumps(sample) + "\n" for sample in samples)
+    return len(samples)
@@ -0,0 +1,203 @@
+import random
+import threading
+import time
+
+import openai
+
+from prompts import count_tokens
+
+# LLM Rate Limiting, Retries and Circuit Breaking
+#
+# Every LLM request passes through guarded_call/guarded_stream. They are
+# module-level, so all Streamlit sessions in a server process share them:
+#
+# - A token bucket per model keeps requests and tokens per minute under the
+#   provider's limits, queueing callers rather than collecting 429s.
+# - Transient failures (rate limits, timeouts, 5xx) are retried with jittered
+#   exponential backoff, honouring Retry-After when the provider sends it.
+# - After repeated failures the circuit breaker opens and calls fail fast with
+#   LLMUnavailable until a trial call succeeds, so callers can fall back to a
+#   degraded mode instead of waiting on a provider that is down.
+
+LLM_LIMITS = {
+    "requests_per_minute": 500,
+    "tokens_per_minute": 30000,  # Prompt (as estimated by prompts.count_tokens) plus max_tokens
+    "max_wait": 10.0,  # Seconds a call may queue for rate limit capacity before failing fast
+    "max_retries": 3,
+    "backoff_base": 0.5,  # Seconds; doubles with each retry, with full jitter
+    "backoff_max": 8.0,
+    "breaker_threshold": 5,  # Consecutive failed attempts that open the breaker
+    "breaker_reset": 30.0,  # Seconds the breaker stays open before allowing a trial call
+}
+
+class LLMUnavailable(Exception):
+    """The LLM can't be used right now; fall back to a degraded mode."""
+
+class TransientLLMError(Exception):
+    """A failure worth retrying, for backends that don't raise OpenAI errors."""
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError, TransientLLMError)
+
+def configure_llm_limits(**settings):
+    """Override any of the LLM_LIMITS settings and reset the limiters and breaker."""
+    global _breaker
+    unknown = set(settings) - set(LLM_LIMITS)
+    if unknown:
+        raise ValueError(f"Unknown LLM limit settings: {sorted(unknown)}")
+    LLM_LIMITS.update(settings)
+    with _limiters_lock:
+        _limiters.clear()
+    _breaker = CircuitBreaker(LLM_LIMITS["breaker_threshold"], LLM_LIMITS["breaker_reset"])
+
+# Rate Limiting
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take amount from the bucket and return the seconds to wait before using it.
+
+        The balance may go negative, so waiting callers are served in order.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount):
+        with self.lock:
+            self.tokens += min(amount, self.capacity)
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens, max_wait):
+        """Block until one request of tokens tokens may be sent, or raise LLMUnavailable."""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > max_wait:
+            self.requests.refund(1)
+            self.tokens.refund(tokens)
+            raise LLMUnavailable(f"Rate limit queue is {wait:.1f}s long")
+        time.sleep(wait)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def _limiter(model):
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = RateLimiter(LLM_LIMITS["requests_per_minute"], LLM_LIMITS["tokens_per_minute"])
+        return limiter
+
+def estimate_tokens(request):
+    """Rough token cost of a chat request: prompt length plus the completion allowance."""
+    return sum(count_tokens(message["content"]) for message in request["messages"]) + request.get("max_tokens", 0)
+
+# Circuit Breaking
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raise LLMUnavailable while open; once reset_after has passed, let one trial call through."""
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_after or self.trial_running:
+                raise LLMUnavailable("LLM circuit breaker is open")
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def cancel_trial(self):
+        """Give up a trial call that was never sent."""
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+_breaker = CircuitBreaker(LLM_LIMITS["breaker_threshold"], LLM_LIMITS["breaker_reset"])
+
+# Guarded Calls
+
+def _backoff(attempt, exc):
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(float(retry_after), LLM_LIMITS["backoff_max"])
+    except (TypeError, ValueError):
+        return random.uniform(0, min(LLM_LIMITS["backoff_max"], LLM_LIMITS["backoff_base"] * 2 ** attempt))
+
+def _start_attempt(request):
+    breaker = _breaker
+    breaker.before_call()
+    try:
+        _limiter(request["model"]).acquire(estimate_tokens(request), LLM_LIMITS["max_wait"])
+    except LLMUnavailable:
+        breaker.cancel_trial()
+        raise
+    return breaker
+
+def guarded_call(request, call):
+    """Return call() for request under the rate limits, retries and circuit breaker."""
+    for attempt in range(LLM_LIMITS["max_retries"] + 1):
+        breaker = _start_attempt(request)
+        try:
+            result = call()
+        except RETRYABLE_ERRORS as exc:
+            breaker.record_failure()
+            if attempt == LLM_LIMITS["max_retries"]:
+                raise LLMUnavailable(f"LLM request failed after {attempt + 1} attempts: {exc}") from exc
+            time.sleep(_backoff(attempt, exc))
+        except BaseException:
+            breaker.cancel_trial()  # Not the provider being down, but a trial must never stay open
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+def guarded_stream(request, stream):
+    """Yield from stream() like guarded_call; only retried if nothing was yielded yet."""
+    for attempt in range(LLM_LIMITS["max_retries"] + 1):
+        breaker = _start_attempt(request)
+        started = False
+        try:
+            for chunk in stream():
+                started = True
+                yield chunk
+        except RETRYABLE_ERRORS as exc:
+            breaker.record_failure()
+            if started or attempt == LLM_LIMITS["max_retries"]:
+                raise LLMUnavailable(f"LLM stream failed after {attempt + 1} attempts: {exc}") from exc
+            time.sleep(_backoff(attempt, exc))
+        except BaseException:
+            breaker.cancel_trial()  # Also when the caller closes the stream early (GeneratorExit)
+            raise
+        else:
+            breaker.record_success()
+            return
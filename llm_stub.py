@@ -0,0 +1,158 @@
+import math
+import os
+import random
+import re
+import threading
+import time
+
+from ai_functions import LLMBackend
+from llm_cache import cache_key
+from llm_resilience import TransientLLMError
+from pydantic_types import DungeonRoomInfo, DungeonRoomsInfo, MonstersInfo, ItemsInfo
+
+# Local LLM Stub
+#
+# An in-process stand-in for OpenAI that needs no network or API key. It
+# answers the game's prompts with schema-valid payloads after a simulated
+# delay. Each response is seeded by the request itself, so the same prompt
+# always gets the same text and the same delay, whatever the thread or order.
+#
+# Select it with LLM_BACKEND=stub (the LLM_STUB_* variables below set the
+# defaults) or configure_llm_backend("stub", latency=..., jitter=...).
+
+STUB_DEFAULTS = {
+    "latency": float(os.environ.get("LLM_STUB_LATENCY", 0.5)),  # Seconds before the first token
+    "jitter": float(os.environ.get("LLM_STUB_JITTER", 0.1)),  # Latency varies uniformly by +/- this much
+    "token_delay": float(os.environ.get("LLM_STUB_TOKEN_DELAY", 0.01)),  # Seconds per generated token
+    "seed": int(os.environ.get("LLM_STUB_SEED", 0)),
+    "error_rate": float(os.environ.get("LLM_STUB_ERROR_RATE", 0.0)),  # Share of calls that fail transiently
+}
+
+ADJECTIVES = ["Whispering", "Sunken", "Forgotten", "Ashen", "Gloomy", "Crumbling", "Frozen", "Echoing",
+              "Gilded", "Shattered", "Dripping", "Silent", "Moss-Covered", "Blackened", "Ancient"]
+PLACES = ["Hall", "Vault", "Passage", "Cavern", "Crypt", "Forge", "Stair", "Chamber", "Tunnel",
+          "Shrine", "Gallery", "Cistern", "Barracks", "Library", "Tomb"]
+MONSTERS = ["Goblin", "Cave Troll", "Ghoul", "Stone Wyrm", "Shade", "Giant Spider", "Skeleton",
+            "Deep Dwarf", "Bat Swarm", "Ooze", "Kobold", "Wight"]
+ITEMS = ["Sword", "Blade", "Sabre", "Longsword", "Cutlass", "Rapier", "Amulet", "Lantern", "Shield"]
+SENTENCES = [
+    "Cold air drifts up from somewhere far below.",
+    "Water drips steadily from the vaulted ceiling.",
+    "Faded dwarven runes line the walls.",
+    "The floor is littered with broken stone and old bones.",
+    "A faint glow pulses deep within the rock.",
+    "Something scratches behind the walls, then falls silent.",
+    "The smell of smoke and rust hangs in the air.",
+    "Carved pillars lean as if the mountain is pressing down on them.",
+]
+
+class StubBackend(LLMBackend):
+    name = "stub"
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(STUB_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown stub settings: {sorted(unknown)}")
+        self.settings = dict(STUB_DEFAULTS, **settings)
+        # Failures are drawn per call, not per request, so a retry can succeed
+        self.errors = random.Random(self.settings["seed"])
+        self.errors_lock = threading.Lock()
+
+    def complete(self, request):
+        rng = self._rng(request)
+        text = self._text(rng)
+        self._wait(rng, len(_tokens(text)))
+        return text
+
+    def complete_json(self, request, json_type):
+        rng = self._rng(request, json_type)
+        response = self._payload(request, json_type, rng)
+        self._wait(rng, len(_tokens(response.model_dump_json())))
+        return response
+
+    def stream(self, request, json_type=None):
+        rng = self._rng(request, json_type)
+        text = self._payload(request, json_type, rng).model_dump_json() if json_type else self._text(rng)
+        self._wait(rng, 0)
+        for token in _tokens(text):
+            time.sleep(self.settings["token_delay"])
+            yield token
+
+    # Timing
+
+    def _rng(self, request, json_type=None):
+        schema = json_type.model_json_schema() if json_type else None
+        return random.Random(f"{self.settings['seed']}:{cache_key(request, schema)}")
+
+    def _wait(self, rng, num_tokens):
+        """Sleep for the time to first token plus num_tokens of generation, then maybe fail."""
+        jitter = self.settings["jitter"]
+        latency = max(0.0, self.settings["latency"] + rng.uniform(-jitter, jitter))
+        time.sleep(latency + num_tokens * self.settings["token_delay"])
+        with self.errors_lock:
+            failed = self.errors.random() < self.settings["error_rate"]
+        if failed:
+            raise TransientLLMError("Simulated LLM failure")
+
+    # Payloads
+
+    def _payload(self, request, json_type, rng):
+        prompt = request["messages"][-1]["content"]
+        if json_type is DungeonRoomInfo:
+            return self._room_info(prompt, rng)
+        if json_type is DungeonRoomsInfo:
+            return self._rooms(prompt, rng)
+        if json_type is MonstersInfo:
+            return self._monsters(prompt, rng)
+        if json_type is ItemsInfo:
+            return self._items(prompt, rng)
+        raise ValueError(f"The LLM stub can't generate {json_type.__name__}")
+
+    def _text(self, rng, sentences=2):
+        return " ".join(rng.sample(SENTENCES, sentences))
+
+    def _room(self, room_id, rng):
+        return {"id": room_id, "name": f"{rng.choice(ADJECTIVES)} {rng.choice(PLACES)}",
+                "description": self._text(rng, 3)}
+
+    def _room_info(self, prompt, rng):
+        # Describe exactly the rooms named in the prompt, as the real model is told to
+        match = re.search(r"Current room.*:\n- id (\d+)", prompt)
+        room_id = int(match.group(1)) if match else 1
+        match = re.search(r"Neighboring rooms.*:\n((?:- .*\n?)*)", prompt)
+        neighbor_ids = [int(i) for i in re.findall(r"^- id (\d+)", match.group(1), re.M)] if match else []
+        return DungeonRoomInfo.model_validate({
+            "current_room": self._room(room_id, rng),
+            "neighbors": [self._room(neighbor_id, rng) for neighbor_id in neighbor_ids],
+        })
+
+    def _rooms(self, prompt, rng):
+        # Room lines start at the margin, their monsters are indented below them
+        match = re.search(r"Rooms to describe.*:\n((?:[ -].*\n?)*)", prompt)
+        room_ids = [int(i) for i in re.findall(r"^- id (\d+)", match.group(1), re.M)] if match else []
+        return DungeonRoomsInfo.model_validate({"rooms": [self._room(room_id, rng) for room_id in room_ids]})
+
+    def _monsters(self, prompt, rng):
+        match = re.search(r"room_id should range from 2 to (\d+)", prompt)
+        num_rooms = int(match.group(1)) if match else 25
+        count = rng.randint(max(1, num_rooms // 3), max(1, num_rooms // 2))
+        return MonstersInfo.model_validate({"monsters": [
+            {"id": i + 1, "name": f"{rng.choice(ADJECTIVES)} {rng.choice(MONSTERS)}",
+             "description": self._text(rng, 1), "room_id": rng.randint(2, num_rooms),
+             "hp": rng.randint(5, 10), "attack": rng.randint(1, 10)}
+            for i in range(count)
+        ]})
+
+    def _items(self, prompt, rng):
+        # Items are placed one per room, excluding the entrance
+        match = re.search(r"Generate between ([\d.]+) to (\d+) items", prompt)
+        low, high = (math.ceil(float(match.group(1))), int(match.group(2)) - 1) if match else (5, 10)
+        return ItemsInfo.model_validate({"items": [
+            {"name": f"{rng.choice(ADJECTIVES)} {rng.choice(ITEMS)}",
+             "description": self._text(rng, 1), "is_sword": rng.random() < 0.8}
+            for _ in range(rng.randint(min(low, high), high))
+        ]})
+
+def _tokens(text):
+    """Split text roughly the way a tokenizer would, keeping leading whitespace."""
+    return re.findall(r"\s*\S+|\s+$", text)
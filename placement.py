@@ -0,0 +1,58 @@
+import numpy as np
+
+# Entity Placement
+#
+# Monsters and items go one per room. All target rooms are drawn at once:
+# each candidate room gets a random key from its weight (key = log(u) / weight,
+# the Efraimidis-Spirakis method) and the rooms with the largest keys win,
+# which is a weighted sample without replacement in one vectorized pass.
+# Without weights every room is equally likely, as with random.choice.
+
+def sample_rooms(room_ids, count, weights=None, rng=None):
+    """Return up to count distinct ids from room_ids in random order.
+
+    weights (aligned with room_ids) make a room proportionally more likely to
+    be picked; rooms with weight 0 never are, so fewer than count may come
+    back. rng is a numpy Generator or a seed.
+    """
+    room_ids = np.asarray(room_ids)
+    rng = np.random.default_rng(rng)
+    if weights is None:
+        keys = rng.random(len(room_ids))
+        count = min(count, len(room_ids))
+    else:
+        weights = np.asarray(weights, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            keys = np.log(rng.random(len(room_ids))) / weights
+        count = min(count, int(np.count_nonzero(weights > 0)))
+    if count <= 0:
+        return room_ids[:0]
+    chosen = np.argpartition(keys, len(keys) - count)[len(keys) - count:]
+    return room_ids[rng.permutation(chosen)]
+
+def room_depths(indptr, indices, start=1):
+    """Hops from start to each room (indexed by room id) over CSR adjacency, -1 if unreachable."""
+    depths = np.full(len(indptr) - 1, -1, dtype=np.int32)
+    depths[start] = 0
+    frontier = np.array([start])
+    level = 0
+    while len(frontier):
+        level += 1
+        # Gather every neighbor of the frontier with one index array
+        counts = indptr[frontier + 1] - indptr[frontier]
+        offsets = np.repeat(indptr[frontier] - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        neighbors = indices[offsets]
+        frontier = np.unique(neighbors[depths[neighbors] < 0])
+        depths[frontier] = level
+    return depths
+
+def depth_weights(depths, bias=1.0):
+    """Placement weights by room id of (1 + depth) ** bias; unreachable rooms get 0.
+
+    A positive bias favours rooms deep in the dungeon, a negative one rooms
+    near the entrance, and 0 is uniform.
+    """
+    reachable = depths >= 0
+    weights = np.zeros(len(depths))
+    weights[reachable] = (1.0 + depths[reachable]) ** bias
+    return weights
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db_functions import use_game, close_db_connection
+
+# Background Room Prefetching
+#
+# While the player reads the current room, descriptions for the rooms they can
+# walk into next are generated on a small shared worker pool. Moving elsewhere
+# cancels work that hasn't started yet; work already talking to the LLM runs to
+# completion and is picked up if the player enters that room later.
+
+PREFETCH_WORKERS = 4
+
+class RoomPrefetcher:
+    def __init__(self, max_workers=PREFETCH_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.lock = threading.Lock()
+        self.pending = {}  # (game_id, room_id) -> Future
+
+    def prefetch(self, game_id, room_ids, describe):
+        """Run describe(room_id) in the background for each room in room_ids.
+
+        Queued work for any other room of the same game is cancelled. Finished
+        work of every game is dropped, so abandoned games don't pile up; its
+        result is already stored (see rooms.described_version), and a later
+        visit finds it there without the Future.
+        """
+        room_ids = set(room_ids)
+        with self.lock:
+            for key, future in list(self.pending.items()):
+                if key[0] == game_id and key[1] in room_ids:
+                    continue
+                if future.done() or (key[0] == game_id and future.cancel()):
+                    del self.pending[key]
+            for room_id in room_ids:
+                key = (game_id, room_id)
+                if key not in self.pending:
+                    self.pending[key] = self.pool.submit(self._run, game_id, room_id, describe)
+
+    def take(self, game_id, room_id):
+        """Remove and return the Future prefetching room_id, or None."""
+        with self.lock:
+            return self.pending.pop((game_id, room_id), None)
+
+    @staticmethod
+    def _run(game_id, room_id, describe):
+        return run_for_game(game_id, describe, room_id)
+
+def run_for_game(game_id, fn, *args):
+    """Call fn(*args) on a worker thread with the thread pointed at game_id's database."""
+    use_game(game_id)
+    try:
+        return fn(*args)
+    finally:
+        close_db_connection()
+
+room_prefetcher = RoomPrefetcher()
@@ -0,0 +1,169 @@
+"""Describe every room of a dungeon up front, so gameplay never waits on the LLM.
+
+The room graph is walked breadth-first from the entrance and cut into batches
+of neighboring rooms, each named and described by one LLM call. A batch is
+written in a single transaction as soon as it arrives, so an interrupted run
+resumes where it stopped: rooms that already have a name are skipped. Once
+every room is described the world is marked pregenerated. The game serves a
+stored description for as long as the room's state is the one it was written
+for; a room whose monsters have since been defeated is described again.
+
+Usage: python pregenerate.py [--game ID] [--rooms 25] [--seed N] [--depth-bias B] [--batch-size 6] [--workers 4] [--backend stub]
+"""
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import streamlit.logger
+
+from db_functions import get_db_connection, use_game, get_all_room_connections, flush_game_state
+from db_functions import update_room_names_and_descriptions, mark_world_pregenerated
+from pydantic_types import DungeonRoomsInfo
+from ai_functions import chat_prompt_json, configure_llm_backend
+from prompts import batch_room_prompt, BATCH_SYSTEM_PROMPT
+from llm_resilience import LLMUnavailable
+from llm_metrics import format_summary
+from generators import populate_world
+
+BATCH_SIZE = 6  # Rooms per LLM call
+ROOM_MAX_TOKENS = 200  # Response tokens allowed per room in a batch
+
+def walk_rooms(room_ids, connections, start=1):
+    """room_ids in breadth-first order from start; rooms it can't reach come last."""
+    order, seen = [], {start}
+    queue = deque([start])
+    while queue:
+        room_id = queue.popleft()
+        order.append(room_id)
+        for neighbor_id in connections.get(room_id, []):
+            if neighbor_id not in seen:
+                seen.add(neighbor_id)
+                queue.append(neighbor_id)
+    return order + sorted(set(room_ids) - seen)
+
+def rooms_to_describe(connections):
+    """Ids of the rooms that still have no name, in walking order."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name FROM rooms")
+    rooms = {room_id: name for room_id, name in cursor.fetchall()}
+    return [room_id for room_id in walk_rooms(rooms, connections) if not rooms[room_id]]
+
+def build_batch_prompt(room_ids, connections):
+    """Return the prompt text for describing room_ids together."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    placeholders = ",".join("?" * len(room_ids))
+    cursor.execute(f"""
+        SELECT room_id, name, description, hp, attack, defeated
+        FROM monsters WHERE room_id IN ({placeholders}) ORDER BY room_id, id
+    """, room_ids)
+    monsters = [dict(monster) for monster in cursor.fetchall()]
+
+    # Named rooms next to the batch, e.g. from batches that have already landed
+    outside = sorted({n for room_id in room_ids for n in connections.get(room_id, [])} - set(room_ids))
+    cursor.execute(f"SELECT id, name FROM rooms WHERE name != '' AND id IN ({','.join('?' * len(outside))})", outside)
+    named_neighbors = [dict(room) for room in cursor.fetchall()]
+
+    rooms = [{"id": room_id, "neighbor_ids": connections.get(room_id, [])} for room_id in room_ids]
+    prompt_text, tokens = batch_room_prompt(rooms, monsters, named_neighbors)
+    print(f'Batch prompt for rooms {room_ids} ({tokens} tokens)')
+    return prompt_text
+
+def save_batch(details, room_ids):
+    """Store the rooms of details that were asked for; returns how many were saved."""
+    wanted = set(room_ids)
+    rooms = {}
+    for room in details.rooms:
+        if room.id in wanted and room.name and room.description:
+            rooms.setdefault(room.id, (room.id, room.name, room.description))
+    update_room_names_and_descriptions(list(rooms.values()))
+    return len(rooms)
+
+def describe_batches(batches, connections, workers):
+    """Describe each batch of room ids; returns the number of rooms saved.
+
+    Up to workers calls are in flight at once. A batch's prompt is built just
+    before it is sent, so it can use the names of batches that landed earlier.
+    The database work stays on this thread, which owns the game's connection.
+    """
+    batches = iter(batches)
+    pending = {}
+    saved = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pregenerate") as pool:
+        def submit_next():
+            room_ids = next(batches, None)
+            if room_ids is not None:
+                prompt_text = build_batch_prompt(room_ids, connections)
+                future = pool.submit(chat_prompt_json, prompt_text, BATCH_SYSTEM_PROMPT,
+                                     ROOM_MAX_TOKENS * len(room_ids), DungeonRoomsInfo, caller="room_batch")
+                pending[future] = room_ids
+
+        for _ in range(workers):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                room_ids = pending.pop(future)
+                try:
+                    count = save_batch(future.result(), room_ids)
+                except LLMUnavailable as exc:
+                    print(f'Rooms {room_ids} skipped, LLM unavailable:', exc)
+                else:
+                    saved += count
+                    print(f'Rooms {room_ids}: {count} described')
+                submit_next()
+    return saved
+
+def pregenerate_rooms(batch_size=BATCH_SIZE, workers=4):
+    """Describe every unnamed room of the current game; returns the number of rooms left.
+
+    Rooms a response left out are retried in another pass, for as long as
+    passes make progress. The world is marked pregenerated once none are left.
+    """
+    connections = get_all_room_connections()
+    while True:
+        todo = rooms_to_describe(connections)
+        if not todo:
+            mark_world_pregenerated()
+            return 0
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        if not describe_batches(batches, connections, workers):
+            return len(todo)  # Nothing is getting through; a later run picks up from here
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--game", help="game id to describe (default: the shared database)")
+    parser.add_argument("--rooms", type=int, default=25, help="rooms in a newly created world")
+    parser.add_argument("--seed", type=int, help="dungeon layout seed for a newly created world")
+    parser.add_argument("--depth-bias", type=float,
+                        help="place monsters and items deeper (>0) or nearer the entrance (<0) in a new world")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rooms per LLM call")
+    parser.add_argument("--workers", type=int, default=4, help="LLM calls in flight at once")
+    parser.add_argument("--backend", help="LLM backend, e.g. openai or stub (default: LLM_BACKEND)")
+    args = parser.parse_args()
+
+    streamlit.logger.set_log_level("error")  # No Streamlit runtime here, so skip its warnings
+    if args.backend:
+        configure_llm_backend(args.backend)
+    use_game(args.game)
+
+    start = time.perf_counter()
+    try:
+        populate_world(num_rooms=args.rooms, seed=args.seed, depth_bias=args.depth_bias)  # Creates the world first if it doesn't exist yet
+    except LLMUnavailable as exc:
+        sys.exit(f"Could not populate the world, LLM unavailable: {exc}")
+    remaining = pregenerate_rooms(args.batch_size, args.workers)
+    flush_game_state()
+    print(format_summary())
+
+    if remaining:
+        print(f"{remaining} room(s) still undescribed after {time.perf_counter() - start:.1f} s; run again to resume")
+        sys.exit(1)
+    print(f"All rooms described in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import math
+
+# Prompt Assembly
+#
+# Room prompts are built from one compact line per room or monster instead of
+# indented JSON, and must fit a token budget. Dense rooms (many neighbors,
+# long descriptions, crowded surroundings) give up detail in a fixed order
+# until they fit: nearby monster descriptions first, then nearby monsters are
+# reduced to counts per room, then neighbor descriptions are shortened and
+# dropped, then the current room's own description. Room ids, names and the
+# monsters in the current room are always kept.
+
+ROOM_PROMPT_BUDGET = 1000  # Tokens for the system and user prompt together
+
+# Characters kept per description at each level of detail (None for all, 0 to
+# drop), and whether monsters in neighboring rooms are only counted
+DETAIL_LEVELS = [
+    {"room": None, "monster": 200, "neighbor": 240, "nearby_monster": 100, "count_nearby": False},
+    {"room": None, "monster": 150, "neighbor": 120, "nearby_monster": 0, "count_nearby": False},
+    {"room": None, "monster": 150, "neighbor": 120, "nearby_monster": 0, "count_nearby": True},
+    {"room": 400, "monster": 100, "neighbor": 60, "nearby_monster": 0, "count_nearby": True},
+    {"room": 200, "monster": 60, "neighbor": 0, "nearby_monster": 0, "count_nearby": True},
+]
+
+ROOM_SYSTEM_PROMPT = (
+    "You are a dungeon master generating immersive room details for a text adventure game. "
+    "Given the current room, its neighbors, and the monsters within, "
+    "provide names and descriptions for each room. Make sure to take into account if the player already defeated the monsters or not. "
+    "Descriptions should hint at interconnections and an overarching story. "
+    "The game is called Shadows of Mythlandia, and follows a hero delving deep into the "
+    "mysterious vaults of an ancient mountain riddled with caverns, dwarven fortresses, "
+    "forgotten tombs, tunnels, and the like. "
+    "The room descriptions should be palpable and vivid, as if you were there yourself. "
+    "To make the game more atmospheric and immersive, room descriptions should use information "
+    "from the surrounding rooms and the monsters within them to create a sense of surroundings. "
+    "When there is a monster present, make sure to focus the description on the monster, and make it clear that it's there. "
+    "Remember that not every room has to be an iconic location, sometimes there are just passageways or tunnels. "
+    "Make sure to replace any unknown rooms with real names and descriptions. "
+    "Keep responses to 500 characters or less. "
+    "Please do not change any room ids, just replace the room names and descriptions. "
+    "Do not generate more neighbors than exist in the neighboring rooms list."
+)
+
+def count_tokens(text):
+    """Estimated token count of text, at about 4 characters per token."""
+    return math.ceil(len(text) / 4)
+
+def clip(text, chars):
+    """Shorten text to about chars characters on a word boundary; None keeps it whole."""
+    if chars is None or len(text) <= chars:
+        return text
+    cut = text[:chars].rsplit(" ", 1)[0]
+    return cut.rstrip(",;:.") + "..."
+
+def _room_line(room, chars):
+    if not room['name']:
+        return f"id {room['id']}: unknown"
+    line = f"id {room['id']}: {room['name']}"
+    if chars != 0 and room['description']:
+        line += f" - {clip(room['description'], chars)}"
+    return line
+
+def _monster_line(monster, chars):
+    state = "defeated" if monster['defeated'] else f"alive, hp {monster['hp']}, attack {monster['attack']}"
+    line = f"{monster['name']} [{state}]"
+    if chars != 0 and monster['description']:
+        line += f": {clip(monster['description'], chars)}"
+    return line
+
+def _nearby_counts(nearby_monsters):
+    """One line per neighboring room, e.g. "- in 4: Goblin x2, Cave Troll (1 defeated)"."""
+    rooms = {}
+    for monster in nearby_monsters:
+        room = rooms.setdefault(monster['room_id'], {"alive": {}, "defeated": 0})
+        if monster['defeated']:
+            room["defeated"] += 1
+        else:
+            room["alive"][monster['name']] = room["alive"].get(monster['name'], 0) + 1
+    lines = []
+    for room_id, room in rooms.items():
+        alive = ", ".join(name if count == 1 else f"{name} x{count}" for name, count in room["alive"].items())
+        defeated = f"({room['defeated']} defeated)" if room["defeated"] else ""
+        lines.append(f"- in {room_id}: {' '.join(part for part in (alive, defeated) if part)}")
+    return lines
+
+def _room_prompt_text(room, visited, monsters, neighbors, nearby_monsters, detail):
+    lines = [f"Current room (visited before: {'yes' if visited else 'no'}):",
+             f"- {_room_line(room, detail['room'])}"]
+
+    lines.append("Monsters here:" if monsters else "Monsters here: none")
+    lines += [f"- {_monster_line(monster, detail['monster'])}" for monster in monsters]
+
+    lines.append("Neighboring rooms (keep ids and order):")
+    lines += [f"- {_room_line(neighbor, detail['neighbor'])}" for neighbor in neighbors]
+
+    if nearby_monsters:
+        lines.append("Monsters in neighboring rooms:")
+        if detail['count_nearby']:
+            lines += _nearby_counts(nearby_monsters)
+        else:
+            lines += [f"- in {monster['room_id']}: {_monster_line(monster, detail['nearby_monster'])}" for monster in nearby_monsters]
+
+    lines.append("Provide a short but immersive description of the current room considering these details, "
+                 "and names and descriptions for the unknown neighboring rooms. "
+                 "Don't change the neighboring rooms that already have names.")
+    return "\n".join(lines)
+
+def room_prompt(room, visited, monsters, neighbors, nearby_monsters, budget=ROOM_PROMPT_BUDGET):
+    """Return (prompt_text, tokens, level) for describing room within budget tokens.
+
+    room and neighbors are dicts with id, name and description; monsters also
+    need hp, attack and defeated, and nearby monsters their room_id. level is
+    the index into DETAIL_LEVELS that was used. If even the most compact level
+    is over budget, it is returned anyway.
+    """
+    system_tokens = count_tokens(ROOM_SYSTEM_PROMPT)
+    for level, detail in enumerate(DETAIL_LEVELS):
+        prompt_text = _room_prompt_text(room, visited, monsters, neighbors, nearby_monsters, detail)
+        tokens = system_tokens + count_tokens(prompt_text)
+        if tokens <= budget:
+            break
+    return prompt_text, tokens, level
+
+# Batch Prompts
+#
+# pregenerate.py describes several connected rooms per call. Each room is a
+# line with its exits, followed by its monsters; rooms named by earlier
+# batches are listed by name only, so new names can build on them.
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a dungeon master naming and describing the rooms of a text adventure game, several at a time. "
+    "The game is called Shadows of Mythlandia, and follows a hero delving deep into the "
+    "mysterious vaults of an ancient mountain riddled with caverns, dwarven fortresses, "
+    "forgotten tombs, tunnels, and the like. "
+    "Each description is read by the player when they first enter the room, so it should be palpable and vivid, "
+    "hint at the rooms it leads to and focus on any monsters present. "
+    "Rooms that connect to each other should feel like parts of the same place and story. "
+    "Remember that not every room has to be an iconic location, sometimes there are just passageways or tunnels. "
+    "Keep each description to 500 characters or less. "
+    "Return exactly one entry per requested room, with its id unchanged."
+)
+
+def batch_room_prompt(rooms, monsters, named_neighbors, monster_chars=100):
+    """Return (prompt_text, tokens) for naming and describing several rooms in one call.
+
+    rooms are dicts with id and neighbor_ids, monsters need room_id, name,
+    description, hp, attack and defeated, and named_neighbors are already
+    described rooms (id and name) next to the batch.
+    """
+    lines = ["Rooms to describe (keep ids and order):"]
+    for room in rooms:
+        lines.append(f"- id {room['id']}, leads to {', '.join(str(i) for i in room['neighbor_ids']) or 'nowhere'}")
+        lines += [f"  - {_monster_line(monster, monster_chars)}" for monster in monsters if monster['room_id'] == room['id']]
+
+    if named_neighbors:
+        lines.append("Rooms already named nearby:")
+        lines += [f"- id {room['id']}: {room['name']}" for room in named_neighbors]
+
+    lines.append("Provide a name and a short but immersive description for every room to describe.")
+    prompt_text = "\n".join(lines)
+    return prompt_text, count_tokens(BATCH_SYSTEM_PROMPT) + count_tokens(prompt_text)
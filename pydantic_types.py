@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 # Dungeon Rooms
 
@@ -12,6 +12,9 @@ class DungeonRoomInfo(BaseModel):
     current_room: RoomDetails
     neighbors: List[RoomDetails]
 
+class DungeonRoomsInfo(BaseModel):
+    rooms: List[RoomDetails]
+
 # Monsters
 
 class MonsterInfo(BaseModel):
@@ -33,4 +36,52 @@ class ItemInfo(BaseModel):
         is_sword: bool
 
 class ItemsInfo(BaseModel):
-    items: List[ItemInfo]
\ No newline at end of file
+    items: List[ItemInfo]
+
+# Room Context
+
+class RoomState(BaseModel):
+    id: int
+    name: str
+    description: str
+    visited: bool
+    state_version: int = 0
+    described_version: Optional[int] = None  # state_version the stored description was written for
+
+class MonsterState(BaseModel):
+    id: int
+    room_id: int
+    name: str
+    description: str
+    full_hp: int
+    hp: int
+    attack: int
+    defeated: bool
+
+class ItemState(BaseModel):
+    id: int
+    room_id: int
+    name: str
+    description: str
+    is_sword: bool
+    is_claimed: bool
+
+class RoomContext(BaseModel):
+    """A room with its neighbors and every monster and item in them, see db_functions.load_room_context."""
+    room: RoomState
+    neighbors: List[RoomState]
+    monsters: List[MonsterState]
+    items: List[ItemState]
+
+    @property
+    def neighbor_ids(self):
+        return [neighbor.id for neighbor in self.neighbors]
+
+    @property
+    def room_monsters(self):
+        return [monster for monster in self.monsters if monster.room_id == self.room.id]
+
+    @property
+    def neighbor_monsters(self):
+        neighbor_ids = set(self.neighbor_ids)
+        return [monster for monster in self.monsters if monster.room_id in neighbor_ids]
@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+# Room Description Cache
+#
+# Room text keyed by (game_id, room_id, state_version). A room's state version
+# only changes when something its narration depends on does, such as a monster
+# in or next to it being defeated (see db_functions.bump_room_state), so a
+# revisit in the same state is a lookup instead of an LLM call. Hp changes and
+# the visited flag don't count. Past max_entries the least recently used room
+# is dropped. This cache only saves the database read: rooms.described_version
+# records the state a stored description was written for, so an unchanged
+# room is not described again after a restart or an eviction either.
+
+ROOM_CACHE = {
+    "max_entries": 4096,
+}
+
+def configure_room_cache(**settings):
+    """Override any of the ROOM_CACHE settings (max_entries)."""
+    unknown = set(settings) - set(ROOM_CACHE)
+    if unknown:
+        raise ValueError(f"Unknown room cache settings: {sorted(unknown)}")
+    ROOM_CACHE.update(settings)
+    room_descriptions.trim()
+
+class RoomDescriptionCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> room text, least recently used first
+
+    def get(self, key):
+        """Return the text stored for key, or None on a miss."""
+        with self.lock:
+            text = self.entries.get(key)
+            if text is not None:
+                self.entries.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        with self.lock:
+            self.entries[key] = text
+            self.entries.move_to_end(key)
+        self.trim()
+
+    def trim(self):
+        with self.lock:
+            while len(self.entries) > ROOM_CACHE["max_entries"]:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+room_descriptions = RoomDescriptionCache()
@@ -0,0 +1,35 @@
+import os
+import random
+from functools import lru_cache
+
+import yaml
+
+from Procedural.describeRoom import describe_terrain, replace_lists
+
+# Template Room Descriptions
+#
+# Offline stand-ins for LLM room descriptions, built by the Procedural engine
+# from the Words vocabularies. They are instant, so they can be shown while
+# the real description is still being written, and are never saved.
+
+WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Procedural", "Words", "Cave.yaml")
+
+@lru_cache(maxsize=None)
+def load_words(path=WORDS_PATH):
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+def template_room(room_id, monsters=()):
+    """Return (name, description) for room_id from the Procedural word lists.
+
+    Each room keeps the same terrain every time; the wording varies. Alive
+    monsters in the room are mentioned so the player isn't surprised by them.
+    """
+    words = load_words()
+    terrain = random.Random(room_id).choice(words['terrainTypes'])
+    name = replace_lists(words[terrain]['name'])
+    description = " ".join(describe_terrain(words, terrain).split())
+    alive = [monster['name'] for monster in monsters if not monster['defeated']]
+    if alive:
+        description += f" {', '.join(alive)} {'blocks' if len(alive) == 1 else 'block'} your way."
+    return name, description
@@ -2,14 +2,17 @@ import streamlit as st
 import json
 import sqlite3
 import random
+import re
+import uuid
 from openai import OpenAI
 
 from types import SimpleNamespace
 
 # Database Utility Functions
-from db_functions import get_db_connection, initialize_database
-from db_functions import add_rooms_to_db, get_room_info, update_room_visited
-from db_functions import fetch_player_stats, update_player_hp
+from db_functions import get_db_connection, initialize_database, use_game
+from db_functions import configure_state_cache, flush_game_state
+from db_functions import add_rooms_to_db, get_room_info, get_neighbor_rooms, update_room_visited
+from db_functions import fetch_player_stats, update_player_hp, get_random_item
 from db_functions import add_monster_to_db, fetch_monster_info, update_monster_hp, mark_monster_defeated, get_monsters_in_room
 
 # Visualization Utility Functions
@@ -22,9 +25,11 @@ from pydantic_types import ItemInfo, ItemsInfo
 
 # AI Utility Functions
 from ai_functions import chat_prompt, chat_prompt_json, get_client
+from llm_resilience import LLMUnavailable
 
 # Generators
-from generators import generate_dungeon_with_cycles, generate_monsters, generate_items, get_room_description
+from generators import generate_dungeon_with_cycles, generate_monsters, generate_items, describe_room_with_deadline, populate_world, prefetch_neighbor_descriptions
+from generators import late_description_pending, late_description_ready, stream_battle_description
 
 st.set_page_config(layout="centered", page_title="Shadows of Mythlandia", menu_items=None, initial_sidebar_state="collapsed")
 
@@ -37,6 +42,19 @@ if "previous_room_id" not in st.session_state:
     st.session_state.previous_room_id = None
 if "searching" not in st.session_state:
         st.session_state.searching = False
+if "game_id" not in st.session_state:
+    # Each session plays its own world; the id in the URL lets a reload resume it
+    game_id = st.query_params.get("game", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", game_id):
+        game_id = uuid.uuid4().hex
+    st.session_state.game_id = game_id
+    st.query_params["game"] = game_id
+
+# Route all database access for this rerun to the session's own game file
+use_game(st.session_state.game_id)
+
+# Serve game state from memory and write it back once per turn
+configure_state_cache(durability="turn")
 
 # Hide menu in production
 hide_streamlit_style = """
@@ -52,18 +70,25 @@ st.image('Images/Shadows.png', use_container_width=True)
 
 if st.session_state.first_run:
     st.session_state.first_run = False
-    with st.spinner('Initializing Game...'):
-        initialize_database()
-    with st.spinner('Recruiting Monsters...'):
-        generate_monsters()
-    with st.spinner('Hiding Loot...'):
-        generate_items()
+    # Builds the dungeon while monsters and loot are generated; resumed worlds return at once
+    with st.spinner('Initializing Game... Recruiting Monsters... Hiding Loot...'):
+        try:
+            populate_world()
+        except LLMUnavailable:
+            st.session_state.first_run = True
+            st.error("The dungeon master is away. Please try again in a moment.")
+            st.stop()
 
 # Initialize text area
 text_placeholder = st.empty()  # Main game text display
 
-# %% Get current room description
-text = get_room_description(st.session_state.current_room_id)
+# %% Get current room description, shown as it is written. A slow LLM never holds up the move:
+# after the deadline a template stands in until the real description arrives
+for text in describe_room_with_deadline(st.session_state.current_room_id):
+    text_placeholder.text_area("text", value=text, height=170, disabled=True, label_visibility="collapsed")
+
+# End of turn: persist everything this turn changed
+flush_game_state()
 
 # # Check for monsters in the current room
 # conn = get_db_connection()
@@ -141,16 +166,14 @@ text = get_room_description(st.session_state.current_room_id)
             
 #             if monster_hp <= 0:
 #                 monster_hp = 0
-#                 with st.spinner('Attacking!'):
-#                     battle_stats.monster_damage = 0
-#                     battle_stats.player_damage = damage
-#                     battle_stats.player_ending_hp = player_hp
-#                     battle_stats.monster_ending_hp = 0
-#                     battle_stats.monster_defeated = True
-#                     battle_stats.player_defeated = False
-#                     item.get_item = True
-#                     desc = generate_battle_descriptions(room_id,battle_stats,monster_name,item)
-#                 st.write(desc)
+#                 battle_stats.monster_damage = 0
+#                 battle_stats.player_damage = damage
+#                 battle_stats.player_ending_hp = player_hp
+#                 battle_stats.monster_ending_hp = 0
+#                 battle_stats.monster_defeated = True
+#                 battle_stats.player_defeated = False
+#                 item.get_item = True
+#                 st.write_stream(stream_battle_description(room_id,battle_stats,monster_name,item))
 #                 st.warning(f"You dealt {damage} damage to the {monster_name}!")
 #                 st.success(f"You defeated the {monster_name}!")
 #                 conn = get_db_connection()
@@ -176,18 +199,16 @@ text = get_room_description(st.session_state.current_room_id)
 #                 # Monster attacks back
 #                 monster_damage = random.randrange(1,monster_attack-player_defense)
 #                 player_hp -= monster_damage
-#                 with st.spinner('Attacking!'):
-#                     battle_stats.monster_damage = monster_damage
-#                     battle_stats.player_damage = damage
-#                     battle_stats.player_ending_hp = player_hp
-#                     battle_stats.monster_ending_hp = monster_hp
-#                     battle_stats.monster_defeated = False
-#                     if player_hp <= 0:
-#                         battle_stats.player_defeated = True
-#                     else:
-#                         battle_stats.player_defeated = False
-#                     desc = generate_battle_descriptions(room_id,battle_stats,monster_name,item)
-#                 st.write(desc)
+#                 battle_stats.monster_damage = monster_damage
+#                 battle_stats.player_damage = damage
+#                 battle_stats.player_ending_hp = player_hp
+#                 battle_stats.monster_ending_hp = monster_hp
+#                 battle_stats.monster_defeated = False
+#                 if player_hp <= 0:
+#                     battle_stats.player_defeated = True
+#                 else:
+#                     battle_stats.player_defeated = False
+#                 st.write_stream(stream_battle_description(room_id,battle_stats,monster_name,item))
 #                 st.warning(f"You dealt {damage} damage to the {monster_name}!")
 #                 st.error(f"The {monster_name} attacked you for {monster_damage} damage!")
 #                 with hp_placeholder.container():
@@ -215,14 +236,7 @@ text = get_room_description(st.session_state.current_room_id)
 
 #         if item_count > 0:
 #             if col2.button("Use Item"):
-#                 conn = get_db_connection()
-#                 cursor = conn.cursor()
-#                 cursor.execute("SELECT item_id FROM player_inventory ORDER BY RANDOM() LIMIT 1")
-#                 item_id = cursor.fetchone()[0]
-#                 cursor.execute("SELECT * FROM items WHERE id = ?", (item_id,))
-#                 item = cursor.fetchone()
-#                 item = ItemInfo(*item)
-#                 conn.close()
+#                 item = get_random_item()
 
 #     # if col2.button("Defend"):
 #     #     st.info("You brace yourself and defend against the attack!")
@@ -242,9 +256,8 @@ text = get_room_description(st.session_state.current_room_id)
 #         st.rerun()
 # else:
 # Get neighboring rooms
-room_data = get_room_info(st.session_state.current_room_id)
-neighbor_ids = json.loads(room_data['connections'])
-neighbors = [get_room_info(neighbor_id) for neighbor_id in neighbor_ids]
+neighbors = get_neighbor_rooms(st.session_state.current_room_id)
+neighbor_ids = [neighbor['id'] for neighbor in neighbors]
 print(neighbors)
 
 # Direction Buttons
@@ -252,7 +265,7 @@ st.write("### Choose a direction:")
 cols = st.columns(len(neighbors))
 for i, neighbor in enumerate(neighbors):
     print(neighbor)
-    if cols[i].button(neighbor['name'], key=i):
+    if cols[i].button(neighbor['name'] or 'Unexplored Passage', key=i):
         st.session_state.previous_room_id = st.session_state.current_room_id
         st.session_state.current_room_id = neighbor_ids[i]
         st.rerun()  # Refresh the app with the new room
@@ -261,9 +274,17 @@ for i, neighbor in enumerate(neighbors):
 if st.button("FORGE", type="primary",key='forge', use_container_width=True):
     st.write('FORGING')
 
-# Update text area
-with text_placeholder:
-    st.text_area("text", value=text, height=170, disabled=True, label_visibility="collapsed")
+# Describe the rooms the player may enter next while they read this one
+prefetch_neighbor_descriptions(st.session_state.current_room_id)
+
+# Swap in the real description once it lands
+if late_description_pending(st.session_state.game_id, st.session_state.current_room_id):
+    @st.fragment(run_every=1.0)
+    def await_late_description():
+        if late_description_ready(st.session_state.game_id, st.session_state.current_room_id):
+            st.rerun()
+        st.caption("The shadows shift as the dungeon master finishes the tale...")
+    await_late_description()
 
 # if st.button("Dungeon Map"):
 with st.container(border=True):
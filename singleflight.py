@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Single-Flight Request Coalescing
+#
+# Concurrent callers asking for the same piece of work (by key) share one
+# execution: the first caller leads and does the work, the others wait for it
+# and share its outcome, including its exception. Once the leader finishes the
+# key is free again, so later callers start a fresh flight.
+
+class FlightAbandoned(Exception):
+    """The leader stopped before finishing (e.g. its stream was closed)."""
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}  # key -> Future of the leader's result
+
+    def _join(self, key):
+        """Return (future, leading) for key, registering a new flight if none is in progress."""
+        with self.lock:
+            future = self.flights.get(key)
+            if future is not None:
+                return future, False
+            future = self.flights[key] = Future()
+            return future, True
+
+    def _land(self, key, future, result=None, exc=None):
+        with self.lock:
+            del self.flights[key]
+        if exc is None:
+            future.set_result(result)
+        elif isinstance(exc, Exception):
+            future.set_exception(exc)
+        else:
+            future.set_exception(FlightAbandoned(f"Leader for {key!r} stopped early"))
+
+    def do(self, key, fn):
+        """Return fn(), run once for all concurrent callers with the same key."""
+        future, leading = self._join(key)
+        if not leading:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._land(key, future, exc=exc)
+            raise
+        self._land(key, future, result)
+        return result
+
+    @contextmanager
+    def lead(self, key):
+        """Yield True to the one caller that should do the work for key.
+
+        Concurrent callers with the same key wait until it is done and get
+        False, or the leader's exception. Use this when the work can't be
+        wrapped in a function, e.g. because it yields as it goes.
+        """
+        future, leading = self._join(key)
+        if not leading:
+            future.result()
+            yield False
+            return
+        try:
+            yield True
+        except BaseException as exc:
+            self._land(key, future, exc=exc)
+            raise
+        self._land(key, future)
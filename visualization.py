@@ -1,23 +1,24 @@
 import networkx as nx
 import plotly.graph_objects as go
 import streamlit as st
-import sqlite3
-import json
+
+from db_functions import get_db_connection, get_all_room_connections, flush_game_state
 
 def fetch_dungeon_data():
-    """Fetch room data from the database."""
-    conn = sqlite3.connect("adventure_game.db", check_same_thread=False)
+    """Fetch room data from the database as (id, name, neighbor ids, visited) rows."""
+    flush_game_state()  # Visited flags may still be waiting in the state cache
+    conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, connections, visited FROM rooms")
-    data = cursor.fetchall()
-    conn.close()
+    cursor.execute("SELECT id, name, visited FROM rooms")
+    rooms = cursor.fetchall()
+    connections = get_all_room_connections()
+    data = [(room_id, name, tuple(connections.get(room_id, ())), visited) for room_id, name, visited in rooms]
     return data
 
 def compute_dungeon_layout(data):
     """Build the graph and compute a consistent layout."""
     G = nx.Graph()
-    for room_id, name, connections_json, visited in data:
-        connections = json.loads(connections_json)
+    for room_id, name, connections, visited in data:
         G.add_node(room_id, name=name, visited=visited)
         for connection in connections:
             G.add_edge(room_id, connection)
@@ -30,8 +31,7 @@ def compute_dungeon_layout(data):
 def compute_pos(data_sub):
     """Build the graph and compute a consistent layout."""
     G = nx.Graph()
-    for room_id, connections_json in data_sub:
-        connections = json.loads(connections_json)
+    for room_id, connections in data_sub:
         G.add_node(room_id)
         for connection in connections:
             G.add_edge(room_id, connection)
@@ -48,8 +48,7 @@ def build_dungeon_graph(data, current_room_id):
     unvisited_neighbors = []
     current_neighbors = []
 
-    for room_id, name, connections_json, visited in data:
-        connections = json.loads(connections_json)
+    for room_id, name, connections, visited in data:
         G.add_node(room_id, name=name, visited=visited)
         if visited:
             visited_nodes.append(room_id)